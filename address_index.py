@@ -0,0 +1,204 @@
+import re
+import math
+import heapq
+import functools
+import logging
+from array import array
+
+from address_matcher import normalize_text
+from gazetteer import (LETTER_TO_DIGIT, DIGIT_TO_LETTER, NUMBER_SUFFIXES, NUMBER_WITH_SUFFIX_PATTERN,
+                       ORDINAL_SIGNS, LEADING_DIGITS, has_ordinal_mark)
+from config import MATCH_INDEX_MIN_SUBSCRIBERS, MATCH_INDEX_CANDIDATES
+
+logger = logging.getLogger(__name__)
+
+# BM25 parameters
+K1 = 1.2
+B = 0.75
+
+# Keys present in more than this fraction of addresses ("calle", "madrid")
+# are skipped at query time; they cost the most and tell the least
+MAX_DF_RATIO = 0.1
+
+STOPWORDS = {'de', 'del', 'la', 'las', 'el', 'los', 'y', 'en'}
+
+# Spanish spelling to sound, applied in order
+PHONETIC_RULES = [
+    (re.compile(r'ch'), 'x'),
+    (re.compile(r'qu'), 'k'),
+    (re.compile(r'c(?=[ei])'), 's'),
+    (re.compile(r'c'), 'k'),
+    (re.compile(r'z'), 's'),
+    (re.compile(r'gu(?=[ei])'), 'g'),
+    (re.compile(r'g(?=[ei])'), 'j'),
+    (re.compile(r'll'), 'y'),
+    (re.compile(r'v|w'), 'b'),
+    (re.compile(r'h'), ''),
+]
+
+# OCR confusions among letters, collapsed after the phonetic rules
+LETTER_CONFUSIONS = [
+    (re.compile(r'rn'), 'm'),
+    (re.compile(r'[ij]'), 'l'),
+    (re.compile(r'q'), 'o'),
+]
+
+REPEATED_LETTERS = re.compile(r'(.)\1+')
+
+
+def phonetic_key(word):
+    """
+    Spanish phonetic key of a lowercase word, also collapsing OCR look-alikes
+
+    Args:
+        word: Normalized word
+
+    Returns:
+        Key string, equal for words that sound or look alike
+    """
+    for pattern, replacement in PHONETIC_RULES:
+        word = pattern.sub(replacement, word)
+    for pattern, replacement in LETTER_CONFUSIONS:
+        word = pattern.sub(replacement, word)
+    return REPEATED_LETTERS.sub(r'\1', word)
+
+
+# Street names, numbers and cities repeat a lot across subscribers
+@functools.lru_cache(maxsize=65536)
+def token_key(token):
+    """
+    Index key of a normalized address token
+
+    Numeric tokens ('28O13', '3l') map look-alike letters to digits and
+    drop a street number suffix or ordinal mark ('31b', '12bis', '2o'); word
+    tokens map look-alike digits to letters and then get a phonetic key.
+
+    Args:
+        token: Normalized token
+
+    Returns:
+        Key string, or None for tokens that are not worth indexing
+    """
+    if NUMBER_WITH_SUFFIX_PATTERN.match(token):
+        return '#' + LEADING_DIGITS.match(token).group()
+
+    digits = sum(1 for c in token if c.isdigit())
+    if digits and digits * 2 >= len(token):
+        # Drop a street number suffix ("31b") or ordinal mark ("2o") before mapping letters
+        if len(token) > 1 and (token[-1].upper() in NUMBER_SUFFIXES or has_ordinal_mark(token)):
+            token = token[:-1]
+        return '#' + ''.join(LETTER_TO_DIGIT.get(c, c) for c in token)
+
+    if len(token) < 2 or token in STOPWORDS:
+        return None
+    return phonetic_key(''.join(DIGIT_TO_LETTER.get(c, c) for c in token))
+
+
+def address_keys(address):
+    """List of index keys of an address, with repetitions"""
+    keys = []
+    # Floor and door tokens ("2ºb") are keyed part by part, as in correct_ocr_tokens
+    for token in ORDINAL_SIGNS.sub(' ', normalize_text(address)).split():
+        key = token_key(token)
+        if key:
+            keys.append(key)
+    return keys
+
+
+class AddressIndex:
+    """
+    Inverted index over subscriber address tokens
+
+    Each key maps to a postings array of subscriber positions and a parallel
+    array of precomputed BM25 weights, so a query only sums weights.
+    """
+
+    def __init__(self, subscribers):
+        self.subscribers = subscribers
+        self.postings = {}
+
+        term_frequencies = []
+        doc_lengths = []
+        for i, subscriber in enumerate(subscribers):
+            if not subscriber.get('address') or not subscriber.get('email'):
+                continue
+            keys = address_keys(subscriber['address'])
+            frequencies = {}
+            for key in keys:
+                frequencies[key] = frequencies.get(key, 0) + 1
+            term_frequencies.append((i, frequencies))
+            doc_lengths.append(len(keys))
+
+        self.doc_count = len(term_frequencies)
+        average_length = (sum(doc_lengths) / self.doc_count) if self.doc_count else 0
+
+        document_frequency = {}
+        for _, frequencies in term_frequencies:
+            for key in frequencies:
+                document_frequency[key] = document_frequency.get(key, 0) + 1
+
+        for (i, frequencies), length in zip(term_frequencies, doc_lengths):
+            norm = K1 * (1 - B + B * length / average_length) if average_length else K1
+            for key, tf in frequencies.items():
+                df = document_frequency[key]
+                idf = math.log(1 + (self.doc_count - df + 0.5) / (df + 0.5))
+                docs, weights = self.postings.get(key) or self.postings.setdefault(key, (array('I'), array('f')))
+                docs.append(i)
+                weights.append(idf * tf * (K1 + 1) / (tf + norm))
+
+        logger.info(f"Built address index: {self.doc_count} subscribers, {len(self.postings)} keys")
+
+    def search(self, address, limit=MATCH_INDEX_CANDIDATES):
+        """
+        Find the subscribers whose addresses share the most distinctive tokens
+
+        Args:
+            address: Query address, e.g. from OCR
+            limit: Maximum number of candidates
+
+        Returns:
+            List of subscriber dictionaries, best first
+        """
+        keys = set(address_keys(address))
+        max_df = max(1, int(self.doc_count * MAX_DF_RATIO))
+
+        postings = [self.postings[key] for key in keys if key in self.postings]
+        selective = [p for p in postings if len(p[0]) <= max_df]
+        # Fall back to common keys only if nothing more selective matched
+        postings = selective or postings
+
+        scores = {}
+        for docs, weights in postings:
+            for doc, weight in zip(docs, weights):
+                scores[doc] = scores.get(doc, 0.0) + weight
+
+        best = heapq.nlargest(limit, scores.items(), key=lambda item: item[1])
+        return [self.subscribers[doc] for doc, _ in best]
+
+
+_index_cache = {'subscribers': None, 'index': None}
+
+
+def index_enabled(subscriber_count):
+    """Check whether a subscriber list of this size is matched through the index"""
+    return 0 < MATCH_INDEX_MIN_SUBSCRIBERS <= subscriber_count
+
+
+def get_address_index(subscribers):
+    """
+    Get the address index of a subscriber snapshot, building it once per snapshot
+
+    Args:
+        subscribers: List of subscriber dictionaries
+
+    Returns:
+        AddressIndex, or None when the list is too small to need one
+    """
+    if not index_enabled(len(subscribers)):
+        return None
+
+    # The subscriber cache hands out the same list until it is refreshed
+    if _index_cache['subscribers'] is not subscribers:
+        _index_cache['index'] = AddressIndex(subscribers)
+        _index_cache['subscribers'] = subscribers
+    return _index_cache['index']
@@ -99,22 +99,49 @@ def calculate_address_similarity(address1, address2):
     # Cap similarity at 1.0
     return min(similarity, 1.0)
 
-def find_matching_subscriber(extracted_address, subscribers):
+def find_matching_subscriber(extracted_address, subscribers, gazetteer=None, index=None):
     """
     Find a matching subscriber based on the extracted address
     
     Args:
         extracted_address: Address extracted from OCR
         subscribers: List of subscriber dictionaries
+        gazetteer: Optional Gazetteer used to prune candidates by postal code
+        index: Optional AddressIndex of subscribers; only its top candidates
+            are scored, the full list only when it finds none (serially, the
+            process pool is only used when there is no index)
         
     Returns:
         Matching subscriber dictionary or None if no match found
     """
+    if index is not None:
+        candidates = index.search(extracted_address)
+        if candidates:
+            logger.debug(f"Index candidates: {len(candidates)} of {len(subscribers)}")
+            return find_matching_subscriber(extracted_address, candidates, gazetteer)
+    
+    if gazetteer is not None:
+        candidates = gazetteer.candidate_subscribers(extracted_address, subscribers)
+        if candidates:
+            logger.debug(f"Pruned candidates by postal code: {len(candidates)} of {len(subscribers)}")
+            best_match = find_matching_subscriber(extracted_address, candidates)
+            if best_match or len(candidates) == len(subscribers):
+                return best_match
+    
     best_match = None
     best_similarity = 0.7  # Threshold for considering a match
     
     logger.debug(f"Looking for matches for address: {extracted_address}")
     
+    # Large subscriber lists are scored across a process pool
+    from parallel_matcher import should_match_in_parallel, find_best_match_parallel
+    if should_match_in_parallel(subscribers):
+        similarity, subscriber = find_best_match_parallel(extracted_address, subscribers)
+        if similarity > best_similarity:
+            best_similarity = similarity
+            best_match = subscriber
+        subscribers = []
+    
     for subscriber in subscribers:
         # Skip subscribers without address or email
         if not subscriber.get('address') or not subscriber.get('email'):
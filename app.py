@@ -1,18 +1,24 @@
 import os
 import logging
-from flask import Flask, render_template, request, jsonify, flash, redirect, url_for, session
+from flask import Flask, Blueprint, current_app, render_template, request, jsonify
 from flask_sqlalchemy import SQLAlchemy
 from sqlalchemy.orm import DeclarativeBase
 from werkzeug.middleware.proxy_fix import ProxyFix
 import base64
-import cv2
-import numpy as np
+import hmac
 import traceback
 
-from ocr_utils import process_image_ocr
+# The OCR (cv2, numpy, pytesseract) and Sheets (gspread, oauth2client)
+# subsystems are imported lazily, see warm_up()
 from address_matcher import find_matching_subscriber
+from gazetteer import get_gazetteer
+from address_index import get_address_index
 from sheets_api import get_subscriber_data
-from email_sender import send_notification_email
+from mail_recorder import init_recorder, enable_sqlite_wal
+from history import (normalize_address_key, resolve_known_return, find_recent_processed_mail,
+                     get_history_page, serialize_processed_mail, upgrade_schema)
+from config import (WARM_UP_OCR, QUALITY_SAMPLE_WIDTH, MIN_SHARPNESS, MIN_BRIGHTNESS, MAX_BRIGHTNESS,
+                    HISTORY_API_TOKEN)
 
 # Configure logging
 logging.basicConfig(level=logging.DEBUG)
@@ -23,33 +29,106 @@ class Base(DeclarativeBase):
 
 db = SQLAlchemy(model_class=Base)
 
-# Create the Flask app
-app = Flask(__name__)
-app.secret_key = os.environ.get("SESSION_SECRET", "dev-secret-key")
-app.wsgi_app = ProxyFix(app.wsgi_app, x_proto=1, x_host=1)
+bp = Blueprint('main', __name__)
 
-# Configure the database (even though we're not using it extensively in this app)
-app.config["SQLALCHEMY_DATABASE_URI"] = os.environ.get("DATABASE_URL", "sqlite:///ocr_app.db")
-app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {
-    "pool_recycle": 300,
-    "pool_pre_ping": True,
-}
-app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+def create_app():
+    """Create and configure the Flask app"""
+    app = Flask(__name__)
+    app.secret_key = os.environ.get("SESSION_SECRET", "dev-secret-key")
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_proto=1, x_host=1)
+    
+    # Configure the database (even though we're not using it extensively in this app)
+    app.config["SQLALCHEMY_DATABASE_URI"] = os.environ.get("DATABASE_URL", "sqlite:///ocr_app.db")
+    app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {
+        "pool_recycle": 300,
+        "pool_pre_ping": True,
+    }
+    app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+    
+    # Initialize the app with the extension
+    db.init_app(app)
+    
+    with app.app_context():
+        # Import the models here
+        import models  # noqa: F401
+        enable_sqlite_wal(db.engine)
+        db.create_all()
+        upgrade_schema(db)
+        # Do not keep the setup connection open: with gunicorn --preload it
+        # would be inherited by every forked worker
+        db.engine.dispose()
+    
+    # ProcessedMail rows are written behind the request in bulk
+    init_recorder(app, db)
+    
+    app.register_blueprint(bp)
+    return app
 
-# Initialize the app with the extension
-db.init_app(app)
+def warm_up(start_match_pool=False):
+    """
+    Load the OCR and Sheets subsystems and build the subscriber caches
+    before the first request
+    
+    Run in the gunicorn master with --preload so workers share the result
+    copy-on-write, and again after fork (cheap when already warm).
+    
+    Args:
+        start_match_pool: Also start the parallel matching pool; only do
+            this in a worker, a pool does not survive fork
+    """
+    if WARM_UP_OCR:
+        import ocr_utils  # noqa: F401
+    
+    subscribers = get_subscriber_data()
+    if not subscribers:
+        return
+    get_gazetteer(subscribers)
+    get_address_index(subscribers)
+    
+    if start_match_pool:
+        from parallel_matcher import should_match_in_parallel, start_pool
+        if should_match_in_parallel(subscribers):
+            start_pool(subscribers)
 
-with app.app_context():
-    # Import the models here
-    import models  # noqa: F401
-    db.create_all()
+def get_recorder():
+    """The current app's ProcessedMail recorder"""
+    return current_app.extensions['processed_mail_recorder']
 
-@app.route('/')
+def match_response(payload):
+    """Return a match result, with the rendered email preview if the client asked for it"""
+    if request.json.get('include_preview'):
+        from email_sender import render_email_template
+        payload['email_html'] = render_email_template(payload['subscriber'])
+    return jsonify(payload)
+
+def known_return_response(subscriber, processed_mail, extracted_address):
+    """Build the match response for an envelope found in the processing history"""
+    return match_response({
+        'status': 'match_found',
+        'message': 'Este sobre ya se procesó anteriormente',
+        'already_processed': True,
+        'processed_at': processed_mail.processed_at.isoformat() if processed_mail.processed_at else None,
+        'notification_sent': processed_mail.notification_sent,
+        'subscriber': {
+            'name': subscriber.get('name', 'Subscriber'),
+            'email': subscriber.get('email', ''),
+            'address': subscriber.get('address', '')
+        },
+        'extracted_address': extracted_address
+    })
+
+@bp.route('/')
 def index():
     """Render the main application page"""
-    return render_template('index.html')
+    # The browser applies the same quality gate before uploading a frame
+    return render_template('index.html', quality={
+        'sample_width': QUALITY_SAMPLE_WIDTH,
+        'min_sharpness': MIN_SHARPNESS,
+        'min_brightness': MIN_BRIGHTNESS,
+        'max_brightness': MAX_BRIGHTNESS
+    })
 
-@app.route('/process-image', methods=['POST'])
+@bp.route('/process-image', methods=['POST'])
 def process_image():
     """Process the captured webcam image, extract address, find matching subscriber"""
     try:
@@ -58,6 +137,10 @@ def process_image():
         if not image_data:
             return jsonify({'error': 'No image data received'}), 400
         
+        import cv2
+        import numpy as np
+        from ocr_utils import process_image_ocr, assess_image_quality
+        
         # Convert base64 image to OpenCV format
         try:
             # Check if the image data is valid
@@ -79,9 +162,27 @@ def process_image():
             logger.error(f"Error processing image data: {str(img_error)}")
             return jsonify({'error': 'Error al procesar los datos de la imagen'}), 400
         
+        # Reject blurry or badly lit frames before spending time on OCR
+        acceptable, sharpness, brightness = assess_image_quality(img)
+        if not acceptable:
+            logger.debug(f"Rejected frame: sharpness={sharpness:.1f} brightness={brightness:.1f}")
+            return jsonify({
+                'status': 'low_quality',
+                'error': 'La imagen está borrosa o mal iluminada. Vuelve a capturarla.',
+                'sharpness': sharpness,
+                'brightness': brightness
+            }), 422
+        
+        # Get subscriber data from Google Sheets
+        logger.debug("Fetching subscriber data from Google Sheets")
+        subscribers = get_subscriber_data()
+        if not subscribers:
+            return jsonify({'error': 'Could not fetch subscriber data'}), 500
+        gazetteer = get_gazetteer(subscribers)
+        
         # Process the image with OCR
         logger.debug("Processing image with OCR")
-        extracted_address, ocr_raw_text, processing_log = process_image_ocr(img)
+        extracted_address, ocr_raw_text, processing_log = process_image_ocr(img, gazetteer)
         
         if not extracted_address:
             return jsonify({
@@ -94,15 +195,15 @@ def process_image():
         logger.debug(f"Raw OCR text: {ocr_raw_text}")
         logger.debug(f"Final extracted address: {extracted_address}")
         
-        # Get subscriber data from Google Sheets
-        logger.debug("Fetching subscriber data from Google Sheets")
-        subscribers = get_subscriber_data()
-        if not subscribers:
-            return jsonify({'error': 'Could not fetch subscriber data'}), 500
+        # Known envelopes are resolved from the history without matching
+        known_subscriber, processed_mail = resolve_known_return(subscribers, normalize_address_key(extracted_address))
+        if known_subscriber:
+            return known_return_response(known_subscriber, processed_mail, extracted_address)
         
         # Find matching subscriber based on the extracted address
         logger.debug(f"Finding matching subscriber for address: {extracted_address}")
-        matched_subscriber = find_matching_subscriber(extracted_address, subscribers)
+        matched_subscriber = find_matching_subscriber(extracted_address, subscribers, gazetteer,
+                                                      get_address_index(subscribers))
         if not matched_subscriber:
             return jsonify({
                 'status': 'not_found',
@@ -111,7 +212,7 @@ def process_image():
             })
         
         # Return the extracted address and matched subscriber for confirmation
-        return jsonify({
+        return match_response({
             'status': 'match_found',
             'message': 'Se ha encontrado un suscriptor que coincide con la dirección',
             'subscriber': {
@@ -127,7 +228,48 @@ def process_image():
         logger.error(traceback.format_exc())
         return jsonify({'error': f'An error occurred: {str(e)}'}), 500
 
-@app.route('/manual-entry', methods=['POST'])
+@bp.route('/live-frame', methods=['POST'])
+def live_frame():
+    """Run the live preview pipeline on a low-resolution frame and return the tentative match"""
+    try:
+        data = request.get_json(silent=True) or {}
+        session_id = data.get('session_id')
+        if not session_id:
+            return jsonify({'error': 'No live session id provided'}), 400
+        
+        from ocr_utils import decode_data_url
+        from live_preview import process_live_frame
+        
+        img = decode_data_url(data.get('image'))
+        if img is None:
+            return jsonify({'error': 'No se pudo decodificar la imagen'}), 400
+        
+        subscribers = get_subscriber_data()
+        if not subscribers:
+            return jsonify({'error': 'Could not fetch subscriber data'}), 500
+        
+        result = process_live_frame(session_id, img, subscribers, get_gazetteer(subscribers),
+                                    get_address_index(subscribers))
+        return jsonify(result)
+    
+    except Exception as e:
+        logger.error(f"Error processing live frame: {str(e)}")
+        logger.error(traceback.format_exc())
+        return jsonify({'error': f'An error occurred: {str(e)}'}), 500
+
+@bp.route('/live-end', methods=['POST'])
+def live_end():
+    """Discard the state of a live preview session"""
+    data = request.get_json(silent=True) or {}
+    session_id = data.get('session_id')
+    if not session_id:
+        return jsonify({'error': 'No live session id provided'}), 400
+    
+    from live_preview import end_live_session
+    end_live_session(session_id)
+    return jsonify({'status': 'success'})
+
+@bp.route('/manual-entry', methods=['POST'])
 def manual_entry():
     """Process manually entered address data"""
     try:
@@ -140,8 +282,13 @@ def manual_entry():
         if not subscribers:
             return jsonify({'error': 'Could not fetch subscriber data'}), 500
         
+        known_subscriber, processed_mail = resolve_known_return(subscribers, normalize_address_key(address_text))
+        if known_subscriber:
+            return known_return_response(known_subscriber, processed_mail, address_text)
+        
         # Find matching subscriber based on the address
-        matched_subscriber = find_matching_subscriber(address_text, subscribers)
+        matched_subscriber = find_matching_subscriber(address_text, subscribers, get_gazetteer(subscribers),
+                                                      get_address_index(subscribers))
         if not matched_subscriber:
             return jsonify({
                 'status': 'not_found',
@@ -150,7 +297,7 @@ def manual_entry():
             })
         
         # Return the extracted address and matched subscriber for confirmation
-        return jsonify({
+        return match_response({
             'status': 'match_found',
             'message': 'Se ha encontrado un suscriptor que coincide con la dirección',
             'subscriber': {
@@ -166,12 +313,12 @@ def manual_entry():
         logger.error(traceback.format_exc())
         return jsonify({'error': f'An error occurred: {str(e)}'}), 500
 
-@app.errorhandler(404)
+@bp.app_errorhandler(404)
 def page_not_found(e):
     """Handle 404 errors"""
     return render_template('index.html'), 404
 
-@app.route('/preview-email', methods=['POST'])
+@bp.route('/preview-email', methods=['POST'])
 def preview_email():
     """Generate a preview of the email template with subscriber data"""
     try:
@@ -193,7 +340,7 @@ def preview_email():
         logger.error(traceback.format_exc())
         return jsonify({'error': f'An error occurred: {str(e)}'}), 500
 
-@app.route('/send-email', methods=['POST'])
+@bp.route('/send-email', methods=['POST'])
 def send_email():
     """Send notification email to the matched subscriber"""
     try:
@@ -202,31 +349,52 @@ def send_email():
         if not subscriber_data:
             return jsonify({'error': 'No subscriber data provided'}), 400
         
-        # Send the notification email
-        from email_sender import send_notification_email
-        email_sent = send_notification_email(subscriber_data)
+        # The client may send null when no address was extracted
+        extracted_address = request.json.get('extracted_address') or ''
+        normalized_address = normalize_address_key(extracted_address)
         
-        # Save the processed mail entry in the database
+        # Suppress the email if this envelope was already notified
         try:
-            from models import ProcessedMail
-            from datetime import datetime
-            
-            processed_mail = ProcessedMail(
-                subscriber_email=subscriber_data.get('email', ''),
-                extracted_address=request.json.get('extracted_address', ''),
-                notification_sent=email_sent,
-                processed_at=datetime.utcnow(),
-                result_message='Email sent successfully' if email_sent else 'Failed to send email'
-            )
-            
-            with app.app_context():
-                db.session.add(processed_mail)
-                db.session.commit()
-                logger.info(f"Saved processed mail record for {subscriber_data.get('email', '')}")
+            previous_mail = find_recent_processed_mail(normalized_address, subscriber_data.get('email', ''),
+                                                       only_notified=True)
         except Exception as db_error:
-            logger.error(f"Error saving to database: {str(db_error)}")
+            logger.error(f"Error looking up processed mail history: {str(db_error)}")
+            previous_mail = None
+        duplicate = previous_mail is not None
+        
+        if duplicate:
+            logger.info(f"Duplicate return for {subscriber_data.get('email', '')}, email suppressed")
+            email_sent = False
+            result_message = 'Duplicate return, email suppressed'
+        else:
+            # Send the notification email
+            from email_sender import send_notification_email
+            email_sent = send_notification_email(subscriber_data)
+            result_message = 'Email sent successfully' if email_sent else 'Failed to send email'
         
+        # Rows for sent notifications back the duplicate check in every
+        # worker, so they are written before responding; the rest are
+        # written in bulk by the recorder
+        processed_mail = dict(
+            subscriber_email=subscriber_data.get('email', ''),
+            extracted_address=extracted_address,
+            normalized_address=normalized_address,
+            notification_sent=email_sent,
+            result_message=result_message
+        )
         if email_sent:
+            get_recorder().record_now(**processed_mail)
+        else:
+            get_recorder().record(**processed_mail)
+        
+        if duplicate:
+            return jsonify({
+                'status': 'duplicate',
+                'message': 'Notification already sent for this envelope',
+                'processed_at': previous_mail.processed_at.isoformat() if previous_mail.processed_at else None,
+                'subscriber': subscriber_data
+            })
+        elif email_sent:
             return jsonify({
                 'status': 'success',
                 'message': 'Email notification sent successfully',
@@ -243,7 +411,38 @@ def send_email():
         logger.error(traceback.format_exc())
         return jsonify({'error': f'An error occurred: {str(e)}'}), 500
 
-@app.errorhandler(500)
+@bp.route('/history', methods=['GET'])
+def history():
+    """Return a page of the processed mail history, newest first"""
+    # Disabled unless HISTORY_API_TOKEN is configured
+    if not HISTORY_API_TOKEN:
+        return jsonify({'error': 'Not found'}), 404
+    
+    auth_header = request.headers.get('Authorization', '')
+    token = auth_header[len('Bearer '):] if auth_header.startswith('Bearer ') else ''
+    if not hmac.compare_digest(token.encode(), HISTORY_API_TOKEN.encode()):
+        return jsonify({'error': 'Unauthorized'}), 401
+    
+    try:
+        before_id = request.args.get('before_id', type=int)
+        limit = request.args.get('limit', 50, type=int)
+        subscriber_email = request.args.get('email')
+        
+        # Write buffered rows first so the newest entries are included
+        get_recorder().flush()
+        rows, next_before_id = get_history_page(before_id, limit, subscriber_email)
+        
+        return jsonify({
+            'status': 'success',
+            'items': [serialize_processed_mail(row) for row in rows],
+            'next_before_id': next_before_id
+        })
+    except Exception as e:
+        logger.error(f"Error fetching history: {str(e)}")
+        logger.error(traceback.format_exc())
+        return jsonify({'error': f'An error occurred: {str(e)}'}), 500
+
+@bp.app_errorhandler(500)
 def server_error(e):
     """Handle 500 errors"""
     logger.error(f"Server error: {str(e)}")
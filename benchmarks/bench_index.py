@@ -0,0 +1,51 @@
+"""
+Benchmark candidate retrieval from the address token index
+
+Usage:
+    python benchmarks/bench_index.py [subscriber_count]
+"""
+import os
+import sys
+import time
+import random
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from address_index import AddressIndex  # noqa: E402
+from address_matcher import find_matching_subscriber  # noqa: E402
+from bench_matching import make_subscribers  # noqa: E402
+
+# Typical Tesseract substitutions
+OCR_NOISE = {'l': '1', 'o': '0', 'S': '5', 'i': 'l', 'B': '8'}
+
+
+def add_ocr_noise(text, rng):
+    return ''.join(OCR_NOISE[c] if c in OCR_NOISE and rng.random() < 0.3 else c for c in text)
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    rng = random.Random(7)
+    subscribers = make_subscribers(count)
+
+    start = time.perf_counter()
+    index = AddressIndex(subscribers)
+    print(f"subscribers={count} build: {time.perf_counter() - start:.2f}s")
+
+    targets = rng.sample(range(count), 200)
+    queries = [add_ocr_noise(subscribers[i]['address'], rng) for i in targets]
+
+    start = time.perf_counter()
+    hits = sum(subscribers[i] in index.search(query) for i, query in zip(targets, queries))
+    elapsed = time.perf_counter() - start
+    print(f"retrieval: {elapsed / len(queries) * 1000:.3f} ms/query, target in candidates {hits}/{len(queries)}")
+
+    start = time.perf_counter()
+    matches = sum(find_matching_subscriber(query, subscribers, index=index) is subscribers[i]
+                  for i, query in zip(targets, queries))
+    elapsed = time.perf_counter() - start
+    print(f"retrieval + verification: {elapsed / len(queries) * 1000:.3f} ms/query, correct {matches}/{len(queries)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+"""
+Benchmark serial vs. parallel subscriber matching
+
+Usage:
+    python benchmarks/bench_matching.py [subscriber_count]
+"""
+import os
+import sys
+import time
+import random
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import parallel_matcher  # noqa: E402
+from address_matcher import normalize_text, extract_address_components  # noqa: E402
+from parallel_matcher import find_best_match_parallel, prepare_subscribers, shutdown_pool  # noqa: E402
+
+STREETS = ['Calle Mayor', 'Gran Vía', 'Avenida de la Constitución', 'Plaza Nueva',
+           'Calle Triana', 'Avda. Diagonal', 'Paseo de Gracia', 'Calle Alcalá']
+CITIES = ['Madrid', 'Barcelona', 'Sevilla', 'Valencia', 'Las Palmas', 'Bilbao']
+
+
+def make_subscribers(count, seed=42):
+    rng = random.Random(seed)
+    return [
+        {
+            'name': f'Suscriptor {i}',
+            'email': f'sub{i}@example.com',
+            'address': f'{rng.choice(STREETS)} {rng.randint(1, 300)}, '
+                       f'{rng.randint(1000, 52999):05d} {rng.choice(CITIES)}',
+        }
+        for i in range(count)
+    ]
+
+
+def match_serial(query):
+    # Same precomputed snapshot and scorer as the workers, in-process, so the
+    # comparison only measures core scaling
+    normalized_query = normalize_text(query)
+    query_postal_code = extract_address_components(normalized_query)['postal_code']
+    return parallel_matcher._score_shard(normalized_query, query_postal_code, 0, len(parallel_matcher._prepared))
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    subscribers = make_subscribers(count)
+    query = subscribers[count // 2]['address'].replace('a', 'o', 1)
+
+    parallel_matcher._prepared = prepare_subscribers(subscribers)
+
+    start = time.perf_counter()
+    serial_score, _ = match_serial(query)
+    serial_time = time.perf_counter() - start
+    print(f"subscribers={count} serial: {serial_time:.3f}s")
+
+    for workers in sorted({2, 4, os.cpu_count() or 1}):
+        # Warm up the pool so forking is not part of the timing
+        find_best_match_parallel(query, subscribers, workers=workers)
+        start = time.perf_counter()
+        score, _ = find_best_match_parallel(query, subscribers, workers=workers)
+        elapsed = time.perf_counter() - start
+        assert abs(score - serial_score) < 1e-9
+        print(f"subscribers={count} workers={workers}: {elapsed:.3f}s "
+              f"(speedup {serial_time / elapsed:.2f}x)")
+
+    shutdown_pool()
+
+
+if __name__ == '__main__':
+    main()
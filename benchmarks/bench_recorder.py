@@ -0,0 +1,63 @@
+"""
+Benchmark ProcessedMail persistence: per-row commit vs. write-behind recorder
+
+Usage:
+    python benchmarks/bench_recorder.py [row_count]
+"""
+import os
+import sys
+import time
+import tempfile
+
+# Use a throwaway SQLite database
+_db_dir = tempfile.mkdtemp()
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_db_dir, 'bench.db')}"
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app, db  # noqa: E402
+from models import ProcessedMail  # noqa: E402
+
+app = create_app()
+mail_recorder = app.extensions['processed_mail_recorder']
+
+
+def make_row(i):
+    return {
+        'subscriber_email': f'sub{i}@example.com',
+        'extracted_address': f'Calle Mayor {i}, 28013 Madrid',
+        'normalized_address': f'calle mayor {i} 28013 madrid',
+        'notification_sent': True,
+        'result_message': 'Email sent successfully'
+    }
+
+
+def bench_per_row_commit(count):
+    start = time.perf_counter()
+    with app.app_context():
+        for i in range(count):
+            db.session.add(ProcessedMail(**make_row(i)))
+            db.session.commit()
+    return time.perf_counter() - start
+
+
+def bench_recorder(count):
+    start = time.perf_counter()
+    for i in range(count):
+        mail_recorder.record(**make_row(i))
+    mail_recorder.flush()
+    return time.perf_counter() - start
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+
+    elapsed = bench_per_row_commit(count)
+    print(f"per-row commit: {count / elapsed:,.0f} rows/s")
+
+    elapsed = bench_recorder(count)
+    print(f"write-behind recorder (batch {mail_recorder.batch_size}): {count / elapsed:,.0f} rows/s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,56 @@
+"""
+Measure import time and time-to-first-request of the Flask app
+
+Each scenario runs in a fresh interpreter so module caches do not carry over.
+
+Usage:
+    python benchmarks/bench_startup.py
+"""
+import os
+import sys
+import json
+import tempfile
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SCENARIO = r'''
+import json, sys, time
+start = time.perf_counter()
+from main import app
+imported = time.perf_counter()
+if sys.argv[1] == "warm":
+    from app import warm_up
+    warm_up()
+warmed = time.perf_counter()
+client = app.test_client()
+response = client.post("/manual-entry", json={"address": "Calle Gran Vía 31, 28013 Madrid"})
+first_request = time.perf_counter()
+print(json.dumps({
+    "import": imported - start,
+    "warm_up": warmed - imported,
+    "first_request": first_request - warmed,
+    "status": response.status_code,
+    "ocr_loaded": "cv2" in sys.modules,
+}))
+'''
+
+
+def run(mode):
+    env = dict(os.environ)
+    env["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+    output = subprocess.run([sys.executable, "-c", SCENARIO, mode], cwd=ROOT, env=env,
+                            capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    for mode in ("lazy", "warm"):
+        result = run(mode)
+        print(f"{mode:5} import={result['import']:.3f}s warm_up={result['warm_up']:.3f}s "
+              f"first_request={result['first_request']:.3f}s ocr_loaded={result['ocr_loaded']} "
+              f"status={result['status']}")
+
+
+if __name__ == '__main__':
+    main()
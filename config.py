@@ -3,6 +3,57 @@ import os
 # OCR Configuration
 OCR_LANG = "spa"  # Spanish language for Tesseract OCR
 
+# Frame quality gate, measured on a copy downscaled to QUALITY_SAMPLE_WIDTH
+# pixels so the same thresholds apply in the browser and on the server
+QUALITY_SAMPLE_WIDTH = int(os.getenv("QUALITY_SAMPLE_WIDTH", 320))
+MIN_SHARPNESS = float(os.getenv("MIN_SHARPNESS", 60.0))  # Laplacian variance
+MIN_BRIGHTNESS = float(os.getenv("MIN_BRIGHTNESS", 40.0))  # mean gray level, 0-255
+MAX_BRIGHTNESS = float(os.getenv("MAX_BRIGHTNESS", 230.0))
+
+# Live Preview Configuration
+LIVE_MIN_INTERVAL = float(os.getenv("LIVE_MIN_INTERVAL", 0.5))  # seconds between processed frames per session
+LIVE_SESSION_TTL = int(os.getenv("LIVE_SESSION_TTL", 300))  # seconds before an idle session is dropped
+LIVE_MAX_SESSIONS = int(os.getenv("LIVE_MAX_SESSIONS", 50))
+# OCR is skipped while no cell of a LIVE_ROI_SIGNATURE_WIDTH-wide thumbnail of the
+# address region changed by more than LIVE_ROI_CHANGE_LEVEL gray levels
+LIVE_ROI_SIGNATURE_WIDTH = int(os.getenv("LIVE_ROI_SIGNATURE_WIDTH", 128))
+LIVE_ROI_CHANGE_LEVEL = int(os.getenv("LIVE_ROI_CHANGE_LEVEL", 16))
+# Even an unchanged region is OCR'd again after this many frames or seconds
+LIVE_OCR_REFRESH_FRAMES = int(os.getenv("LIVE_OCR_REFRESH_FRAMES", 4))
+LIVE_OCR_REFRESH_SECONDS = float(os.getenv("LIVE_OCR_REFRESH_SECONDS", 3.0))
+
+# Gazetteer Configuration
+# Optional CSV of Spanish postal codes and street names (columns: postal_code, street)
+GAZETTEER_CSV_PATH = os.getenv("GAZETTEER_CSV_PATH", "")
+
+# Matching Configuration
+# Subscriber count from which candidates are retrieved from the token index (0 disables it)
+MATCH_INDEX_MIN_SUBSCRIBERS = int(os.getenv("MATCH_INDEX_MIN_SUBSCRIBERS", 1000))
+MATCH_INDEX_CANDIDATES = int(os.getenv("MATCH_INDEX_CANDIDATES", 20))  # verified with the precise scorer
+# Subscriber count above which matching is sharded across a process pool (0 disables it);
+# only applies when the index is disabled for the list, see MATCH_INDEX_MIN_SUBSCRIBERS
+PARALLEL_MATCH_THRESHOLD = int(os.getenv("PARALLEL_MATCH_THRESHOLD", 20000))
+MATCH_WORKERS = int(os.getenv("MATCH_WORKERS", 0))  # 0 means one per CPU core
+
+# History Configuration
+# Envelopes processed within this many days are recognised as known returns
+DUPLICATE_WINDOW_DAYS = int(os.getenv("DUPLICATE_WINDOW_DAYS", 30))
+# The /history endpoint exposes subscriber emails and addresses; it is disabled
+# unless a token is set, and then requires "Authorization: Bearer <token>"
+HISTORY_API_TOKEN = os.getenv("HISTORY_API_TOKEN", "")
+
+# ProcessedMail rows are buffered and bulk-inserted when either limit is reached
+RECORDER_BATCH_SIZE = int(os.getenv("RECORDER_BATCH_SIZE", 100))
+RECORDER_FLUSH_INTERVAL = float(os.getenv("RECORDER_FLUSH_INTERVAL", 2.0))  # seconds
+# Rows kept while the database is unreachable; the oldest are dropped beyond this
+RECORDER_MAX_PENDING = int(os.getenv("RECORDER_MAX_PENDING", 10000))
+
+# Startup Configuration
+# Import the OCR stack during warm-up; disable on manual-entry-only instances
+WARM_UP_OCR = os.getenv("WARM_UP_OCR", "1") == "1"
+# Seconds the subscriber list fetched from Google Sheets is reused
+SUBSCRIBER_CACHE_TTL = int(os.getenv("SUBSCRIBER_CACHE_TTL", 300))
+
 # Google Sheets Configuration
 SHEET_URL = "https://docs.google.com/spreadsheets/d/1X30rUyIiKk3MY2DxFxqrJlJ0WZcqgo0aTnKhPOnZQPc/edit?usp=sharing"
 SHEET_ID = "1X30rUyIiKk3MY2DxFxqrJlJ0WZcqgo0aTnKhPOnZQPc"
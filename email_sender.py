@@ -1,6 +1,7 @@
 import os
 import smtplib
 import logging
+import functools
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
 from jinja2 import Environment, FileSystemLoader
@@ -8,6 +9,37 @@ from config import SMTP_SERVER, SMTP_PORT, EMAIL_SENDER, EMAIL_PASSWORD, EMAIL_S
 
 logger = logging.getLogger(__name__)
 
+# Rendered emails are cached per subscriber, so the preview shown after a
+# match and the email sent on confirmation come from a single render
+EMAIL_CACHE_SIZE = 256
+
+_template_env = Environment(loader=FileSystemLoader(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'templates')))
+
+def _email_cache_key(subscriber):
+    return (
+        subscriber.get('name', 'Suscriptor'),
+        subscriber.get('address', ''),
+        subscriber.get('email', '')
+    )
+
+@functools.lru_cache(maxsize=EMAIL_CACHE_SIZE)
+def _render_email(name, address, email):
+    template = _template_env.get_template('email_template.html')
+    return template.render(name=name, address=address, email=email)
+
+@functools.lru_cache(maxsize=EMAIL_CACHE_SIZE)
+def _build_mime_payload(name, address, email):
+    # Create message container
+    msg = MIMEMultipart('alternative')
+    msg['Subject'] = EMAIL_SUBJECT
+    msg['From'] = EMAIL_SENDER
+    msg['To'] = email
+    
+    # Attach HTML part
+    msg.attach(MIMEText(_render_email(name, address, email), 'html'))
+    
+    return msg.as_bytes()
+
 def render_email_template(subscriber):
     """
     Render the email template with subscriber information
@@ -18,16 +50,19 @@ def render_email_template(subscriber):
     Returns:
         Rendered HTML email content
     """
-    # Load the template from the templates directory
-    env = Environment(loader=FileSystemLoader('templates'))
-    template = env.get_template('email_template.html')
+    return _render_email(*_email_cache_key(subscriber))
+
+def build_email_payload(subscriber):
+    """
+    Build the MIME message sent over SMTP, reusing the cached render
     
-    # Render the template with subscriber data
-    return template.render(
-        name=subscriber.get('name', 'Suscriptor'),
-        address=subscriber.get('address', ''),
-        email=subscriber.get('email', '')
-    )
+    Args:
+        subscriber: Dictionary containing subscriber information
+        
+    Returns:
+        Serialized MIME message as bytes
+    """
+    return _build_mime_payload(*_email_cache_key(subscriber))
 
 def send_notification_email(subscriber):
     """
@@ -64,24 +99,14 @@ def send_notification_email(subscriber):
 def send_email_via_smtp(subscriber, recipient_email):
     """Send email using SMTP"""
     try:
-        # Create message container
-        msg = MIMEMultipart('alternative')
-        msg['Subject'] = EMAIL_SUBJECT
-        msg['From'] = EMAIL_SENDER
-        msg['To'] = recipient_email
-        
-        # Render the email content
-        html_content = render_email_template(subscriber)
-        
-        # Attach HTML part
-        part = MIMEText(html_content, 'html')
-        msg.attach(part)
+        # Reuse the message rendered for the preview, if any
+        payload = build_email_payload(subscriber)
         
         # Connect to SMTP server and send email
         with smtplib.SMTP(SMTP_SERVER, SMTP_PORT) as server:
             server.starttls()
             server.login(EMAIL_SENDER, EMAIL_PASSWORD)
-            server.send_message(msg)
+            server.sendmail(EMAIL_SENDER, [recipient_email], payload)
         
         logger.info(f"Email notification sent via SMTP to {recipient_email}")
         return True
@@ -0,0 +1,441 @@
+import csv
+import re
+import logging
+from bisect import bisect_left, bisect_right
+from difflib import get_close_matches
+
+from address_matcher import normalize_text
+
+logger = logging.getLogger(__name__)
+
+# Characters Tesseract commonly confuses, mapped to their digit / letter reading
+LETTER_TO_DIGIT = {
+    'O': '0', 'o': '0', 'D': '0', 'Q': '0',
+    'l': '1', 'I': '1', 'i': '1', '|': '1', '!': '1',
+    'Z': '2', 'z': '2',
+    'S': '5', 's': '5',
+    'G': '6', 'b': '6',
+    'T': '7',
+    'B': '8',
+    'g': '9', 'q': '9',
+}
+DIGIT_TO_LETTER = {
+    '0': 'o',
+    '1': 'l',
+    '|': 'l',
+    '2': 'z',
+    '5': 's',
+    '6': 'g',
+    '8': 'b',
+}
+# In all-caps words a vertical stroke is an I rather than an l
+DIGIT_TO_UPPER_LETTER = dict(DIGIT_TO_LETTER, **{'1': 'I', '|': 'I'})
+
+# Letters that may legitimately follow a street number (e.g. "31B", "31b"),
+# compared in uppercase
+NUMBER_SUFFIXES = set('ABCDEFGH')
+# A street number followed by a suffix letter or "bis" ("31b", "12bis")
+NUMBER_WITH_SUFFIX_PATTERN = re.compile(r'^\d+(?:[a-h]|bis)$', re.IGNORECASE)
+
+# Ordinal marks after a floor or door number ("2º", "3ª", "2o")
+ORDINAL_MARKS = set('ºªoa')
+# Tokens are split at these marks and each part is corrected on its own ("2ºB", "nº5")
+ORDINAL_SIGNS = re.compile(r'([ºª])')
+LEADING_DIGITS = re.compile(r'^\d*')
+# Ordinals are short; a longer token ending in 'o' is a misread 0 ("2801o")
+MAX_ORDINAL_LENGTH = 3
+
+# Words that open the street part of an address; street words are only
+# snapped after one of these so names on the envelope are left alone
+STREET_TYPES = {
+    'c', 'calle', 'cl', 'av', 'avd', 'avda', 'avenida', 'pl', 'pza', 'plaza',
+    'paseo', 'po', 'pso', 'ronda', 'rda', 'camino', 'cmno', 'carretera', 'ctra',
+    'travesia', 'trav', 'pasaje', 'psje', 'glorieta', 'via', 'urbanizacion', 'urb',
+}
+
+TOKEN_PATTERN = re.compile(r'^(\W*)(.*?)(\W*)$')
+
+
+def _slot_type(token):
+    """
+    Decide whether an OCR token sits in a numeric or a word slot
+
+    Args:
+        token: Token without surrounding punctuation
+
+    Returns:
+        'numeric', 'word' or None when the token is ambiguous
+    """
+    digits = sum(1 for c in token if c.isdigit())
+    letters = sum(1 for c in token if c.isalpha())
+
+    if digits and digits >= letters:
+        return 'numeric'
+    if letters and letters > digits:
+        return 'word'
+    return None
+
+
+def has_ordinal_mark(token):
+    """Check whether a numeric token ends in an ordinal mark ("2º", "2o")"""
+    return (1 < len(token) <= MAX_ORDINAL_LENGTH
+            and token[-1] in ORDINAL_MARKS
+            and token[:-1].isdigit())
+
+
+def correct_numeric_token(token):
+    """
+    Map letter look-alikes to digits inside a numeric token
+
+    A trailing suffix letter is kept as a street number suffix ("31B",
+    "31b") and a trailing ordinal mark as an ordinal ("2o").
+
+    Args:
+        token: Token classified as numeric
+
+    Returns:
+        Corrected token
+    """
+    if has_ordinal_mark(token):
+        return token
+
+    chars = list(token)
+    for i, c in enumerate(chars):
+        if c.isdigit():
+            continue
+        if i == len(chars) - 1 and i > 0 and c.upper() in NUMBER_SUFFIXES:
+            continue
+        chars[i] = LETTER_TO_DIGIT.get(c, c)
+    return ''.join(chars)
+
+
+def correct_word_token(token):
+    """
+    Map digit look-alikes to letters inside a word token
+
+    A leading run of digits is kept: it is a number followed by letters
+    ("3er"), not a misread letter.
+
+    Args:
+        token: Token classified as a word
+
+    Returns:
+        Corrected token, keeping the case of the surrounding letters
+    """
+    digits = LEADING_DIGITS.match(token).group()
+    rest = token[len(digits):]
+    if all(c.isupper() for c in rest if c.isalpha()):
+        return digits + ''.join(DIGIT_TO_UPPER_LETTER.get(c, c).upper() for c in rest)
+    return digits + ''.join(DIGIT_TO_LETTER.get(c, c) for c in rest)
+
+
+def correct_token(token):
+    """
+    Correct a token without surrounding punctuation in its own slot
+
+    Street numbers with a suffix ("31b", "12bis") are kept as they are.
+
+    Args:
+        token: Token without surrounding punctuation
+
+    Returns:
+        Tuple (corrected_token, slot) with slot as returned by _slot_type
+    """
+    if NUMBER_WITH_SUFFIX_PATTERN.match(token):
+        return token, 'numeric'
+
+    slot = _slot_type(token)
+    if slot == 'numeric':
+        return correct_numeric_token(token), slot
+    if slot == 'word':
+        return correct_word_token(token), slot
+    return token, slot
+
+
+class Gazetteer:
+    """
+    Known postal codes and street vocabulary used to correct OCR output
+
+    Both collections are kept as sorted, de-duplicated lists so lookups
+    are binary searches and the structure stays compact in memory.
+    """
+
+    def __init__(self, postal_codes=(), street_words=()):
+        self.postal_codes = sorted(set(postal_codes))
+        self.street_words = sorted(set(street_words))
+
+    def __len__(self):
+        return len(self.postal_codes) + len(self.street_words)
+
+    @classmethod
+    def from_subscribers(cls, subscribers):
+        """
+        Build a gazetteer from a subscriber snapshot
+
+        Args:
+            subscribers: List of subscriber dictionaries
+
+        Returns:
+            Gazetteer instance
+        """
+        gazetteer = cls()
+        gazetteer.add_subscribers(subscribers)
+        return gazetteer
+
+    @classmethod
+    def from_csv(cls, path):
+        """
+        Load a gazetteer from a CSV file of Spanish postal codes and streets
+
+        The file needs a header row with a 'postal_code' and/or a 'street'
+        column; any other column is ignored.
+
+        Args:
+            path: Path to the CSV file
+
+        Returns:
+            Gazetteer instance
+        """
+        postal_codes = []
+        streets = []
+        with open(path, newline='', encoding='utf-8') as f:
+            for row in csv.DictReader(f):
+                postal_codes.append(row.get('postal_code') or '')
+                streets.append(row.get('street') or '')
+
+        gazetteer = cls()
+        gazetteer.add(postal_codes, streets)
+        logger.info(f"Loaded gazetteer from {path}: {len(gazetteer.postal_codes)} postal codes, "
+                    f"{len(gazetteer.street_words)} street words")
+        return gazetteer
+
+    def add(self, postal_codes=(), streets=()):
+        """
+        Merge postal codes and street names into the gazetteer
+
+        Args:
+            postal_codes: Iterable of postal code strings
+            streets: Iterable of street names or full addresses
+        """
+        codes = set(self.postal_codes)
+        for code in postal_codes:
+            code = str(code).strip()
+            if len(code) == 4 and code.isdigit():
+                # Sheets drops the leading zero of codes such as 08036
+                code = '0' + code
+            if len(code) == 5 and code.isdigit():
+                codes.add(code)
+
+        words = set(self.street_words)
+        for street in streets:
+            for word in normalize_text(street).split():
+                if len(word) > 2 and word.isalpha():
+                    words.add(word)
+
+        self.postal_codes = sorted(codes)
+        self.street_words = sorted(words)
+
+    def add_subscribers(self, subscribers):
+        """
+        Merge the postal codes and street names of a subscriber list
+
+        Args:
+            subscribers: List of subscriber dictionaries
+        """
+        postal_codes = []
+        streets = []
+        for subscriber in subscribers:
+            address = subscriber.get('address', '')
+            streets.append(address)
+            streets.append(subscriber.get('city', ''))
+            postal_codes.append(subscriber.get('postal_code', ''))
+            postal_codes.extend(re.findall(r'\b\d{5}\b', address))
+        self.add(postal_codes, streets)
+
+    def has_postal_code(self, code):
+        """Check whether a postal code is known"""
+        i = bisect_left(self.postal_codes, code)
+        return i < len(self.postal_codes) and self.postal_codes[i] == code
+
+    def has_street_word(self, word):
+        """Check whether a normalized word belongs to a known street"""
+        i = bisect_left(self.street_words, word)
+        return i < len(self.street_words) and self.street_words[i] == word
+
+    def snap_postal_code(self, code):
+        """
+        Snap a 5-digit code to a known postal code one digit away
+
+        Only codes sharing the first two digits (the province) are
+        considered, which is a contiguous range of the sorted array.
+
+        Args:
+            code: 5-digit string
+
+        Returns:
+            The known postal code, or the input when there is no unique match
+        """
+        if not self.postal_codes or self.has_postal_code(code):
+            return code
+
+        prefix = code[:2]
+        lo = bisect_left(self.postal_codes, prefix)
+        hi = bisect_right(self.postal_codes, prefix + '999')
+
+        candidates = [known for known in self.postal_codes[lo:hi]
+                      if sum(a != b for a, b in zip(known, code)) == 1]
+        if len(candidates) == 1:
+            return candidates[0]
+        return code
+
+    def snap_word(self, word):
+        """
+        Snap an OCR word to the closest known street word
+
+        Only words sharing the first letter and within one character of the
+        length are compared; the first letter bounds a contiguous range of
+        the sorted array.
+
+        Args:
+            word: Word token
+
+        Returns:
+            The closest known street word, or the input when nothing is close
+        """
+        normalized = normalize_text(word)
+        if len(normalized) < 4 or not self.street_words or self.has_street_word(normalized):
+            return word
+
+        first = normalized[0]
+        lo = bisect_left(self.street_words, first)
+        hi = bisect_left(self.street_words, chr(ord(first) + 1))
+        length = len(normalized)
+        candidates = [known for known in self.street_words[lo:hi] if abs(len(known) - length) <= 1]
+
+        matches = get_close_matches(normalized, candidates, n=1, cutoff=0.8)
+        if not matches:
+            return word
+
+        snapped = matches[0]
+        if word.isupper():
+            return snapped.upper()
+        if word[:1].isupper():
+            return snapped.capitalize()
+        return snapped
+
+    def candidate_subscribers(self, address, subscribers):
+        """
+        Restrict a subscriber list to those sharing the address's postal code
+
+        Args:
+            address: Address string
+            subscribers: List of subscriber dictionaries
+
+        Returns:
+            The subset sharing a known postal code, or None when the address
+            has no known postal code to prune on
+        """
+        codes = [code for code in re.findall(r'\b\d{5}\b', address) if self.has_postal_code(code)]
+        if not codes:
+            return None
+
+        candidates = []
+        for subscriber in subscribers:
+            subscriber_code = str(subscriber.get('postal_code', '')).zfill(5)
+            if subscriber_code in codes or any(code in subscriber.get('address', '') for code in codes):
+                candidates.append(subscriber)
+        return candidates
+
+
+def correct_ocr_tokens(text, gazetteer=None):
+    """
+    Context-aware correction of OCR look-alike characters
+
+    Digits are enforced in numeric slots and letters in word slots. When a
+    gazetteer is given, postal codes are snapped to known values, and so are
+    words in street context: after a street type ("Calle", "Avda.") up to
+    the street number, and the city after a postal code.
+
+    Args:
+        text: Whitespace-normalized OCR text
+        gazetteer: Optional Gazetteer instance
+
+    Returns:
+        Corrected text
+    """
+    corrected = []
+    street_context = False
+    for token in text.split():
+        lead, core, trail = TOKEN_PATTERN.match(token).groups()
+
+        if ORDINAL_SIGNS.search(core):
+            # Floor, door or "nº": the mark separates independent slots
+            core = ''.join(part if ORDINAL_SIGNS.match(part) else correct_token(part)[0]
+                           for part in ORDINAL_SIGNS.split(core))
+            street_context = False
+            corrected.append(f"{lead}{core}{trail}")
+            continue
+
+        core, slot = correct_token(core)
+        if slot == 'numeric':
+            # The street ends at its number; a postal code is followed by the city
+            street_context = False
+            if gazetteer is not None and len(core) == 5 and core.isdigit():
+                core = gazetteer.snap_postal_code(core)
+                street_context = True
+        elif slot == 'word':
+            words = normalize_text(core).split()
+            if words and words[0] in STREET_TYPES:
+                street_context = True
+            elif gazetteer is not None and street_context:
+                core = gazetteer.snap_word(core)
+        else:
+            street_context = False
+
+        # A comma or line break closes the street or city part
+        if ',' in trail or ';' in trail:
+            street_context = False
+
+        corrected.append(f"{lead}{core}{trail}")
+
+    return ' '.join(corrected)
+
+
+_gazetteer_cache = {'subscribers': None, 'gazetteer': None}
+_csv_gazetteer = None
+
+
+def get_gazetteer(subscribers):
+    """
+    Get the gazetteer for a subscriber snapshot, building it once per snapshot
+
+    The CSV configured in GAZETTEER_CSV_PATH, if any, is merged in.
+
+    Args:
+        subscribers: List of subscriber dictionaries
+
+    Returns:
+        Gazetteer instance
+    """
+    from config import GAZETTEER_CSV_PATH
+
+    # The subscriber cache hands out the same list until it is refreshed
+    if _gazetteer_cache['subscribers'] is subscribers:
+        return _gazetteer_cache['gazetteer']
+
+    global _csv_gazetteer
+    if _csv_gazetteer is None:
+        _csv_gazetteer = Gazetteer()
+        if GAZETTEER_CSV_PATH:
+            try:
+                _csv_gazetteer = Gazetteer.from_csv(GAZETTEER_CSV_PATH)
+            except Exception as e:
+                logger.error(f"Error loading gazetteer CSV: {str(e)}")
+
+    gazetteer = Gazetteer(_csv_gazetteer.postal_codes, _csv_gazetteer.street_words)
+    gazetteer.add_subscribers(subscribers)
+
+    # Keep only the latest snapshot
+    _gazetteer_cache['gazetteer'] = gazetteer
+    _gazetteer_cache['subscribers'] = subscribers
+    return gazetteer
@@ -0,0 +1,48 @@
+"""
+Gunicorn hooks that warm the app up before it serves requests
+
+Run with --preload so the OCR/Sheets imports and subscriber caches are
+built once in the master and shared copy-on-write by the workers.
+
+Live preview sessions are kept in process memory (see live_preview.py), so
+a single worker serves all operators; it uses threads so that one
+operator's Tesseract run (a subprocess) does not block the others.
+"""
+import os
+
+workers = int(os.getenv("WEB_CONCURRENCY", 1))
+worker_class = "gthread"
+threads = int(os.getenv("GUNICORN_THREADS", 8))
+
+
+def when_ready(server):
+    if server.cfg.workers > 1:
+        server.log.warning("Live preview sessions are per worker; route each session to one "
+                           "worker (sticky sessions) or run a single worker")
+
+    # With --preload the app is already imported in the master
+    if server.cfg.preload_app:
+        from app import warm_up
+        warm_up()
+
+
+def post_fork(server, worker):
+    # Pooled DB connections opened in the master must not be shared with the
+    # worker; drop them from this process's pool without closing the master's sockets
+    from main import app
+    from app import db
+    with app.app_context():
+        db.engine.dispose(close=False)
+
+    # Every worker runs its own matching pool; split the cores between them
+    # so the total stays at one process per core (MATCH_WORKERS overrides)
+    from parallel_matcher import limit_worker_count
+    limit_worker_count(server.cfg.workers)
+
+    from app import warm_up
+    warm_up(start_match_pool=True)
+
+
+def worker_exit(server, worker):
+    from main import app
+    app.extensions['processed_mail_recorder'].flush()
@@ -0,0 +1,165 @@
+import logging
+from datetime import datetime, timedelta
+
+from flask import current_app
+
+from address_matcher import normalize_text
+from config import DUPLICATE_WINDOW_DAYS
+
+logger = logging.getLogger(__name__)
+
+# Upper bound for a single history page
+MAX_PAGE_SIZE = 200
+
+
+def normalize_address_key(address):
+    """
+    Build the lookup key stored in ProcessedMail.normalized_address
+    
+    Args:
+        address: Extracted or manually entered address
+        
+    Returns:
+        Normalized address truncated to the column size
+    """
+    return normalize_text(address)[:512]
+
+
+def find_recent_processed_mail(normalized_address, subscriber_email=None, only_notified=False):
+    """
+    Find the most recent ProcessedMail row for the same envelope
+    
+    Envelopes are recognised by their OCR'd address only; the lookup key is
+    indexed, so this stays fast with large histories.
+    
+    Args:
+        normalized_address: Key built with normalize_address_key
+        subscriber_email: Only consider rows for this subscriber
+        only_notified: Only consider rows whose notification was sent
+        
+    Returns:
+        ProcessedMail instance or None
+    """
+    from models import ProcessedMail
+    
+    if not normalized_address:
+        return None
+    
+    cutoff = datetime.utcnow() - timedelta(days=DUPLICATE_WINDOW_DAYS)
+    
+    # Rows still buffered by the recorder are the most recent ones
+    recorder = current_app.extensions.get('processed_mail_recorder')
+    if recorder is not None:
+        for values in reversed(recorder.pending()):
+            if only_notified and not values.get('notification_sent'):
+                continue
+            if subscriber_email and values.get('subscriber_email') != subscriber_email:
+                continue
+            if values.get('normalized_address') == normalized_address:
+                return ProcessedMail(**values)
+    
+    query = ProcessedMail.query.filter(ProcessedMail.normalized_address == normalized_address,
+                                       ProcessedMail.processed_at >= cutoff)
+    if subscriber_email:
+        query = query.filter(ProcessedMail.subscriber_email == subscriber_email)
+    if only_notified:
+        query = query.filter(ProcessedMail.notification_sent.is_(True))
+    return query.order_by(ProcessedMail.processed_at.desc()).first()
+
+
+def resolve_known_return(subscribers, normalized_address):
+    """
+    Resolve an envelope against the processing history
+    
+    Args:
+        subscribers: Current subscriber snapshot
+        normalized_address: Key built with normalize_address_key from the OCR text
+        
+    Returns:
+        Tuple (subscriber, processed_mail), or (None, None) when the envelope
+        is unknown or its subscriber is no longer in the snapshot
+    """
+    try:
+        processed_mail = find_recent_processed_mail(normalized_address)
+    except Exception as e:
+        logger.error(f"Error looking up processed mail history: {str(e)}")
+        return None, None
+    
+    if not processed_mail:
+        return None, None
+    
+    for subscriber in subscribers:
+        if subscriber.get('email') == processed_mail.subscriber_email:
+            logger.info(f"Envelope already processed on {processed_mail.processed_at} for {processed_mail.subscriber_email}")
+            return subscriber, processed_mail
+    
+    return None, None
+
+
+def get_history_page(before_id=None, limit=50, subscriber_email=None):
+    """
+    Get a page of the processing history, newest first
+    
+    Uses keyset pagination on the primary key instead of OFFSET, so every
+    page is an index range scan regardless of how deep it is.
+    
+    Args:
+        before_id: Only return rows with a smaller id (the previous page's next_before_id)
+        limit: Page size, capped at MAX_PAGE_SIZE
+        subscriber_email: Optional filter on the subscriber email
+        
+    Returns:
+        Tuple (rows, next_before_id) with next_before_id None on the last page
+    """
+    from models import ProcessedMail
+    
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    
+    query = ProcessedMail.query
+    if subscriber_email:
+        query = query.filter(ProcessedMail.subscriber_email == subscriber_email)
+    if before_id:
+        query = query.filter(ProcessedMail.id < before_id)
+    
+    # Fetch one extra row to know whether there is a next page
+    rows = query.order_by(ProcessedMail.id.desc()).limit(limit + 1).all()
+    next_before_id = rows[limit - 1].id if len(rows) > limit else None
+    
+    return rows[:limit], next_before_id
+
+
+def serialize_processed_mail(processed_mail):
+    """Convert a ProcessedMail row to a JSON-serializable dictionary"""
+    return {
+        'id': processed_mail.id,
+        'subscriber_email': processed_mail.subscriber_email,
+        'extracted_address': processed_mail.extracted_address,
+        'notification_sent': processed_mail.notification_sent,
+        'processed_at': processed_mail.processed_at.isoformat() if processed_mail.processed_at else None,
+        'result_message': processed_mail.result_message
+    }
+
+
+def upgrade_schema(db):
+    """
+    Add the lookup columns and indexes to a processed_mail table created
+    before they existed (db.create_all does not alter existing tables)
+    
+    Args:
+        db: Flask-SQLAlchemy extension instance
+    """
+    from sqlalchemy import inspect, text
+    from models import ProcessedMail
+    
+    table = ProcessedMail.__table__
+    existing_columns = {column['name'] for column in inspect(db.engine).get_columns(table.name)}
+    
+    with db.engine.begin() as connection:
+        for column in table.columns:
+            if column.name not in existing_columns:
+                column_type = column.type.compile(dialect=db.engine.dialect)
+                connection.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}"))
+                logger.info(f"Added column {table.name}.{column.name}")
+        
+        for index in table.indexes:
+            index.create(bind=connection, checkfirst=True)
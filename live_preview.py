@@ -0,0 +1,176 @@
+import time
+import logging
+import threading
+
+from address_matcher import find_matching_subscriber
+from config import (LIVE_MIN_INTERVAL, LIVE_SESSION_TTL, LIVE_MAX_SESSIONS, LIVE_ROI_SIGNATURE_WIDTH,
+                    LIVE_ROI_CHANGE_LEVEL, LIVE_OCR_REFRESH_FRAMES, LIVE_OCR_REFRESH_SECONDS)
+
+logger = logging.getLogger(__name__)
+
+
+class LiveSession:
+    """
+    Per-operator state of the live preview
+
+    The browser polls /live-frame with one request in flight per session
+    rather than holding a WebSocket/SSE stream: a stream would pin a sync
+    gunicorn worker (or thread) for the whole session, and the app has no
+    async server. Sessions live in this process's memory, so the app is
+    served by a single gunicorn worker with threads (see gunicorn.conf.py).
+    If frames of a session do reach another process, that process only
+    misses the cached OCR and runs it again; the browser's single request
+    in flight still bounds the CPU spent per session.
+    """
+
+    def __init__(self):
+        # Held while a frame is processed; frames arriving meanwhile are dropped
+        self.lock = threading.Lock()
+        self.last_seen = time.monotonic()
+        self.last_processed = 0.0
+        # Cached OCR of the current region, reused while the region is stable
+        self.roi_signature = None
+        self.roi_text = ''
+        self.ocr_time = 0.0
+        self.frames_since_ocr = 0
+        self.stable_frames = 0
+        # Cached match for the last OCR text
+        self.matched_text = None
+        self.matched_subscriber = None
+        self.last_result = {'status': 'searching'}
+
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+
+def get_live_session(session_id):
+    """
+    Get or create the live session for an id, evicting idle sessions
+
+    Args:
+        session_id: Id generated by the browser for the live preview
+
+    Returns:
+        LiveSession instance
+    """
+    now = time.monotonic()
+    with _sessions_lock:
+        for key in [key for key, s in _sessions.items() if now - s.last_seen > LIVE_SESSION_TTL]:
+            del _sessions[key]
+
+        session = _sessions.get(session_id)
+        if session is None:
+            if len(_sessions) >= LIVE_MAX_SESSIONS:
+                # Drop the least recently used session
+                oldest = min(_sessions, key=lambda key: _sessions[key].last_seen)
+                del _sessions[oldest]
+            session = _sessions[session_id] = LiveSession()
+
+        session.last_seen = now
+        return session
+
+
+def end_live_session(session_id):
+    """Forget the state of a live session"""
+    with _sessions_lock:
+        _sessions.pop(session_id, None)
+
+
+def process_live_frame(session_id, image, subscribers, gazetteer=None, index=None):
+    """
+    Run the incremental live pipeline on one low-resolution frame
+
+    At most one frame per session is processed at a time and at most one
+    every LIVE_MIN_INTERVAL seconds; other frames are dropped and answered
+    with the last result, which bounds the CPU spent per session. OCR is
+    skipped while the address region looks unchanged, but never for more
+    than LIVE_OCR_REFRESH_FRAMES frames or LIVE_OCR_REFRESH_SECONDS seconds,
+    and never when the last OCR found no text or the last frame was rejected.
+
+    Args:
+        session_id: Id generated by the browser for the live preview
+        image: OpenCV image in BGR format
+        subscribers: Current subscriber snapshot
+        gazetteer: Optional Gazetteer for OCR correction and matching
+        index: Optional AddressIndex for candidate retrieval
+
+    Returns:
+        Result dictionary with a 'status' of 'searching', 'low_quality' or
+        'match_found', and 'dropped' set when the frame was skipped
+    """
+    from ocr_utils import (assess_image_quality, detect_address_region, ocr_region,
+                           compute_region_signature, region_changed)
+
+    session = get_live_session(session_id)
+
+    if not session.lock.acquire(blocking=False):
+        return dict(session.last_result, dropped=True)
+
+    try:
+        now = time.monotonic()
+        if now - session.last_processed < LIVE_MIN_INTERVAL:
+            return dict(session.last_result, dropped=True)
+        session.last_processed = now
+
+        acceptable, sharpness, brightness = assess_image_quality(image)
+        if not acceptable:
+            session.stable_frames = 0
+            # The envelope may have been swapped while the frame was unusable
+            session.roi_signature = None
+            # Keep a tentative match visible while the operator adjusts the envelope
+            if session.matched_subscriber:
+                return dict(session.last_result, stable_frames=0)
+            session.last_result = {'status': 'low_quality', 'sharpness': sharpness, 'brightness': brightness}
+            return session.last_result
+
+        roi = detect_address_region(image)
+        roi_signature = compute_region_signature(roi, LIVE_ROI_SIGNATURE_WIDTH)
+
+        region_unchanged = (session.roi_signature is not None
+                            and not region_changed(roi_signature, session.roi_signature, LIVE_ROI_CHANGE_LEVEL))
+        ocr_fresh = (session.frames_since_ocr < LIVE_OCR_REFRESH_FRAMES
+                     and now - session.ocr_time < LIVE_OCR_REFRESH_SECONDS)
+
+        if region_unchanged and ocr_fresh and session.roi_text:
+            session.frames_since_ocr += 1
+            session.stable_frames += 1
+        else:
+            text = ocr_region(roi, gazetteer)
+            # The signature is only a hint; the text decides whether the envelope changed
+            session.stable_frames = session.stable_frames + 1 if text and text == session.roi_text else 0
+            session.roi_signature = roi_signature
+            session.roi_text = text
+            session.ocr_time = now
+            session.frames_since_ocr = 0
+            logger.debug(f"Live OCR for session {session_id}: {session.roi_text}")
+
+        text = session.roi_text
+        if text != session.matched_text:
+            # A new text replaces the tentative match, even when nothing matches it
+            session.matched_text = text
+            session.matched_subscriber = (find_matching_subscriber(text, subscribers, gazetteer, index)
+                                          if text else None)
+
+        if session.matched_subscriber:
+            subscriber = session.matched_subscriber
+            session.last_result = {
+                'status': 'match_found',
+                'subscriber': {
+                    'name': subscriber.get('name', 'Subscriber'),
+                    'email': subscriber.get('email', ''),
+                    'address': subscriber.get('address', '')
+                },
+                'extracted_address': session.matched_text,
+                'stable_frames': session.stable_frames
+            }
+        else:
+            session.last_result = {
+                'status': 'searching',
+                'extracted_address': text,
+                'stable_frames': session.stable_frames
+            }
+        return session.last_result
+
+    finally:
+        session.lock.release()
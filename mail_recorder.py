@@ -0,0 +1,193 @@
+import os
+import atexit
+import logging
+import threading
+from datetime import datetime
+
+from config import RECORDER_BATCH_SIZE, RECORDER_FLUSH_INTERVAL, RECORDER_MAX_PENDING
+
+logger = logging.getLogger(__name__)
+
+
+def enable_sqlite_wal(engine):
+    """
+    Switch SQLite connections to WAL mode so concurrent gunicorn workers
+    can read while another one writes
+
+    Args:
+        engine: SQLAlchemy engine; non-SQLite engines are left untouched
+    """
+    from sqlalchemy import event
+
+    if engine.dialect.name != 'sqlite':
+        return
+
+    @event.listens_for(engine, 'connect')
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute("PRAGMA busy_timeout=5000")
+        cursor.close()
+
+
+class ProcessedMailRecorder:
+    """
+    Write-behind buffer for ProcessedMail rows
+
+    Rows are queued in memory and written with one bulk INSERT when the
+    buffer reaches batch_size or every flush_interval seconds, whichever
+    comes first. Remaining rows are flushed on shutdown. Queued rows are
+    only visible to this process, so rows that other workers must see
+    right away are written with record_now.
+
+    If a batch fails, its rows are written one by one and the rows that
+    still fail are logged and dropped. While the database is unreachable
+    the buffer is capped at max_pending rows, dropping the oldest.
+    """
+
+    def __init__(self, app, db, batch_size=RECORDER_BATCH_SIZE, flush_interval=RECORDER_FLUSH_INTERVAL,
+                 max_pending=RECORDER_MAX_PENDING):
+        self.app = app
+        self.db = db
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self._pending = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._pid = None
+
+    def record(self, **values):
+        """
+        Queue a ProcessedMail row
+
+        Args:
+            values: ProcessedMail column values
+        """
+        values.setdefault('processed_at', datetime.utcnow())
+        self._ensure_thread()
+
+        with self._lock:
+            self._pending.append(values)
+            full = len(self._pending) >= self.batch_size
+            self._trim_pending()
+
+        if full:
+            self._wakeup.set()
+
+    def record_now(self, **values):
+        """
+        Queue a ProcessedMail row and write the buffer before returning
+
+        If the write fails the row stays queued, as with record.
+
+        Args:
+            values: ProcessedMail column values
+        """
+        self.record(**values)
+        self.flush()
+
+    def pending(self):
+        """Snapshot of the rows that are not written yet"""
+        with self._lock:
+            return list(self._pending)
+
+    def flush(self):
+        """
+        Write all queued rows with a single bulk INSERT
+
+        Returns:
+            Number of rows written
+        """
+        # Serialize flushes so rows are written in the order they were queued
+        with self._flush_lock:
+            with self._lock:
+                rows, self._pending = self._pending, []
+            if not rows:
+                return 0
+
+            from sqlalchemy import insert
+            from sqlalchemy.exc import OperationalError
+            from models import ProcessedMail
+
+            with self.app.app_context():
+                try:
+                    self.db.session.execute(insert(ProcessedMail), rows)
+                    self.db.session.commit()
+                    logger.info(f"Saved {len(rows)} processed mail records")
+                    return len(rows)
+                except OperationalError as e:
+                    # The database is unreachable or locked; keep the rows for the next flush
+                    self.db.session.rollback()
+                    logger.error(f"Error saving {len(rows)} processed mail records, will retry: {str(e)}")
+                    self._requeue(rows)
+                    return 0
+                except Exception as e:
+                    self.db.session.rollback()
+                    logger.error(f"Error saving {len(rows)} processed mail records, saving one by one: {str(e)}")
+
+                # Isolate the rows that cannot be written so they do not block the rest
+                saved = 0
+                for row in rows:
+                    try:
+                        self.db.session.execute(insert(ProcessedMail), [row])
+                        self.db.session.commit()
+                        saved += 1
+                    except Exception as e:
+                        self.db.session.rollback()
+                        logger.error(f"Dropped processed mail record {row}: {str(e)}")
+
+            logger.info(f"Saved {saved} of {len(rows)} processed mail records")
+            return saved
+
+    def _requeue(self, rows):
+        """Put unwritten rows back in front of the buffer"""
+        with self._lock:
+            self._pending = rows + self._pending
+            self._trim_pending()
+
+    def _trim_pending(self):
+        # Called with self._lock held
+        overflow = len(self._pending) - self.max_pending
+        if overflow > 0:
+            logger.error(f"Processed mail buffer full, dropped the {overflow} oldest records")
+            del self._pending[:overflow]
+
+    def _ensure_thread(self):
+        # The flusher thread does not survive a fork, so start one per process
+        if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='processed-mail-recorder', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self.flush()
+
+
+def init_recorder(app, db):
+    """
+    Create the app's recorder and make sure it is flushed on shutdown
+
+    The recorder is available as app.extensions['processed_mail_recorder'].
+
+    Args:
+        app: Flask application
+        db: Flask-SQLAlchemy extension instance
+
+    Returns:
+        ProcessedMailRecorder instance
+    """
+    recorder = ProcessedMailRecorder(app, db)
+    app.extensions['processed_mail_recorder'] = recorder
+    atexit.register(recorder.flush)
+    return recorder
@@ -11,8 +11,10 @@ class User(UserMixin, db.Model):
 class ProcessedMail(db.Model):
     """Model to store logs of processed returned mail"""
     id = db.Column(db.Integer, primary_key=True)
-    subscriber_email = db.Column(db.String(120), nullable=False)
+    subscriber_email = db.Column(db.String(120), nullable=False, index=True)
     extracted_address = db.Column(db.Text, nullable=False)
+    # Lookup key used to recognise an envelope that was already processed
+    normalized_address = db.Column(db.String(512), index=True)
     notification_sent = db.Column(db.Boolean, default=False)
-    processed_at = db.Column(db.DateTime, default=datetime.utcnow)
+    processed_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
     result_message = db.Column(db.Text)
@@ -1,8 +1,10 @@
+import base64
 import cv2
 import numpy as np
 import pytesseract
 import logging
-from config import OCR_LANG
+from config import OCR_LANG, QUALITY_SAMPLE_WIDTH, MIN_SHARPNESS, MIN_BRIGHTNESS, MAX_BRIGHTNESS
+from gazetteer import correct_ocr_tokens
 
 logger = logging.getLogger(__name__)
 
@@ -32,12 +34,102 @@ def preprocess_image(image):
     
     return blurred
 
-def process_image_ocr(image):
+def decode_data_url(image_data):
+    """
+    Decode a base64 data URL produced by canvas.toDataURL
+    
+    Args:
+        image_data: Data URL string
+        
+    Returns:
+        OpenCV image in BGR format, or None if it cannot be decoded
+    """
+    if not image_data or ',' not in image_data:
+        return None
+    try:
+        nparr = np.frombuffer(base64.b64decode(image_data.split(',', 1)[1]), np.uint8)
+    except ValueError:
+        return None
+    if nparr.size == 0:
+        return None
+    return cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+
+def assess_image_quality(image):
+    """
+    Cheap sharpness and brightness check to reject frames before OCR
+    
+    Args:
+        image: OpenCV image in BGR format
+        
+    Returns:
+        Tuple (acceptable, sharpness, brightness) where sharpness is the
+        variance of the Laplacian and brightness the mean gray level
+    """
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    
+    # Measure on a fixed width so thresholds do not depend on the resolution
+    height, width = gray.shape
+    if width > QUALITY_SAMPLE_WIDTH:
+        sample_height = max(1, round(height * QUALITY_SAMPLE_WIDTH / width))
+        gray = cv2.resize(gray, (QUALITY_SAMPLE_WIDTH, sample_height), interpolation=cv2.INTER_AREA)
+    
+    sharpness = float(cv2.Laplacian(gray, cv2.CV_64F).var())
+    brightness = float(gray.mean())
+    
+    acceptable = (sharpness >= MIN_SHARPNESS
+                  and MIN_BRIGHTNESS <= brightness <= MAX_BRIGHTNESS)
+    return acceptable, sharpness, brightness
+
+def ocr_region(roi, gazetteer=None, psm=6):
+    """
+    Run a single OCR pass over an address region
+    
+    Cheaper than process_image_ocr and without the demo fallback, for the
+    live preview where the same region is seen many times.
+    
+    Args:
+        roi: OpenCV image of the address region
+        gazetteer: Optional Gazetteer used to correct the OCR text
+        psm: Tesseract page segmentation mode
+        
+    Returns:
+        Cleaned OCR text, empty if nothing was read
+    """
+    preprocessed = preprocess_image(roi)
+    text = pytesseract.image_to_string(preprocessed, config=f'-l {OCR_LANG} --oem 3 --psm {psm}')
+    return clean_ocr_text(text, gazetteer)
+
+def compute_region_signature(roi, width=128):
+    """
+    Compute a small brightness-normalized thumbnail of an address region
+    
+    Each cell averages a block of pixels, so sensor noise cancels out while
+    a changed character still darkens or lightens its cells as long as they
+    are smaller than a character.
+    
+    Args:
+        roi: OpenCV image in BGR format
+        width: Thumbnail width in cells; the height keeps the aspect ratio
+        
+    Returns:
+        2D int16 array
+    """
+    gray = cv2.cvtColor(roi, cv2.COLOR_BGR2GRAY)
+    height = max(1, round(width * gray.shape[0] / gray.shape[1]))
+    small = cv2.resize(gray, (width, height), interpolation=cv2.INTER_AREA).astype(np.int16)
+    return small - int(small.mean())
+
+def region_changed(signature1, signature2, level=16):
+    """Check whether any cell of two compute_region_signature values differs by more than level"""
+    return signature1.shape != signature2.shape or bool(np.any(np.abs(signature1 - signature2) > level))
+
+def process_image_ocr(image, gazetteer=None):
     """
     Process the image using OCR to extract postal address
     
     Args:
         image: OpenCV image
+        gazetteer: Optional Gazetteer used to correct the OCR text
         
     Returns:
         Tuple containing (extracted_address, raw_ocr_text, processing_log)
@@ -70,7 +162,7 @@ def process_image_ocr(image):
             text = pytesseract.image_to_string(preprocessed, config=custom_config)
             all_raw_texts.append(f"PSM {psm}: {text}")
             
-            cleaned = clean_ocr_text(text)
+            cleaned = clean_ocr_text(text, gazetteer)
             if cleaned:
                 extracted_texts.append(cleaned)
                 processing_log.append(f"Extracted text with PSM {psm}: {cleaned[:50]}...")
@@ -113,12 +205,13 @@ def process_image_ocr(image):
         
         return final_address, raw_ocr_text, processing_log
 
-def clean_ocr_text(text):
+def clean_ocr_text(text, gazetteer=None):
     """
     Clean and format OCR extracted text
     
     Args:
         text: Raw OCR text
+        gazetteer: Optional Gazetteer to snap postal codes and street words
         
     Returns:
         Cleaned and formatted text
@@ -126,17 +219,9 @@ def clean_ocr_text(text):
     # Remove excessive newlines and whitespace
     cleaned = ' '.join(text.split())
     
-    # Replace common OCR errors in Spanish addresses
-    replacements = {
-        '0': 'O',  # Sometimes 0 is misread as O
-        'l': '1',  # Sometimes lowercase l is misread as 1
-        '|': 'I',  # Sometimes | is misread as I
-    }
-    
-    for old, new in replacements.items():
-        cleaned = cleaned.replace(old, new)
-    
-    return cleaned
+    # Fix common OCR errors in Spanish addresses depending on context:
+    # digits in numeric slots (postal codes, numbers), letters in words
+    return correct_ocr_tokens(cleaned, gazetteer)
 
 def detect_address_region(image):
     """
@@ -0,0 +1,214 @@
+import os
+import atexit
+import logging
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from difflib import SequenceMatcher
+
+from address_matcher import normalize_text, extract_address_components
+from config import PARALLEL_MATCH_THRESHOLD, MATCH_WORKERS
+
+logger = logging.getLogger(__name__)
+
+# Precomputed snapshot shared with the workers. It is set in the parent
+# before the pool forks, so workers read it copy-on-write instead of
+# receiving the subscriber list pickled with every call.
+_snapshot_key = None
+_prepared = []
+_pool = None
+# Requests run in threads (gunicorn gthread), so pool changes are serialized
+_pool_lock = threading.RLock()
+# Per-process budget set by limit_worker_count, e.g. from a gunicorn hook
+_worker_limit = None
+
+
+def prepare_subscribers(subscribers):
+    """
+    Precompute the normalized address and postal code of each subscriber
+
+    Args:
+        subscribers: List of subscriber dictionaries
+
+    Returns:
+        List of (index, normalized_address, postal_code) tuples for the
+        subscribers that have both an address and an email
+    """
+    prepared = []
+    for i, subscriber in enumerate(subscribers):
+        if not subscriber.get('address') or not subscriber.get('email'):
+            continue
+        normalized = normalize_text(subscriber['address'])
+        postal_code = extract_address_components(normalized)['postal_code']
+        prepared.append((i, normalized, postal_code))
+    return prepared
+
+
+def _score_shard(normalized_query, query_postal_code, start, stop):
+    """
+    Score one shard of the shared snapshot against the query
+
+    Runs inside a worker process. Scoring mirrors calculate_address_similarity.
+
+    Returns:
+        Tuple (best_similarity, subscriber_index) or (0, None) if the shard is empty
+    """
+    best_similarity = 0
+    best_index = None
+    matcher = SequenceMatcher(None, normalized_query, '')
+
+    for index, normalized, postal_code in _prepared[start:stop]:
+        matcher.set_seq2(normalized)
+        similarity = matcher.ratio()
+        if query_postal_code and postal_code == query_postal_code:
+            similarity += 0.2
+        similarity = min(similarity, 1.0)
+
+        if similarity > best_similarity:
+            best_similarity = similarity
+            best_index = index
+
+    return best_similarity, best_index
+
+
+def get_worker_count():
+    """Number of worker processes to use for parallel matching"""
+    if MATCH_WORKERS:
+        return MATCH_WORKERS
+    if _worker_limit is not None:
+        return _worker_limit
+    return os.cpu_count() or 1
+
+
+def limit_worker_count(processes):
+    """
+    Share the CPU cores between several processes that each run a pool
+
+    Without MATCH_WORKERS, each of the given number of processes gets an
+    equal share of the cores; with a share of one, matching stays serial.
+
+    Args:
+        processes: Number of processes running a matching pool (e.g. gunicorn workers)
+    """
+    global _worker_limit
+    _worker_limit = max(1, (os.cpu_count() or 1) // max(1, processes))
+
+
+def parallel_matching_available():
+    """Parallel matching relies on fork for copy-on-write sharing"""
+    return 'fork' in multiprocessing.get_all_start_methods() and get_worker_count() > 1
+
+
+def should_match_in_parallel(subscribers):
+    """
+    Check whether a subscriber list is large enough for parallel matching
+
+    Lists matched through the address index only ever score a few
+    candidates, and its rare no-candidate fallback is scanned serially, so
+    the pool is only used (and started) when the index is disabled for the
+    list's size.
+    """
+    from address_index import index_enabled
+
+    return (PARALLEL_MATCH_THRESHOLD > 0
+            and len(subscribers) >= PARALLEL_MATCH_THRESHOLD
+            and not index_enabled(len(subscribers))
+            and parallel_matching_available())
+
+
+def _snapshot_fingerprint(subscribers):
+    return hash(tuple((s.get('address'), s.get('email')) for s in subscribers))
+
+
+def _get_pool(subscribers, workers):
+    """
+    Get a process pool whose workers share the given subscriber snapshot
+
+    The pool is recreated only when the snapshot changes.
+    """
+    global _snapshot_key, _prepared, _pool
+
+    key = (_snapshot_fingerprint(subscribers), workers)
+    with _pool_lock:
+        if _pool is not None and key == _snapshot_key:
+            return _pool
+
+        shutdown_pool()
+        _prepared = prepare_subscribers(subscribers)
+        _snapshot_key = key
+        _pool = ProcessPoolExecutor(max_workers=workers,
+                                    mp_context=multiprocessing.get_context('fork'))
+        logger.info(f"Started matching pool with {workers} workers for {len(_prepared)} subscribers")
+        return _pool
+
+
+def start_pool(subscribers, workers=None):
+    """
+    Start the matching pool for a subscriber snapshot ahead of the first query
+
+    Args:
+        subscribers: List of subscriber dictionaries
+        workers: Number of worker processes (defaults to get_worker_count())
+    """
+    workers = workers or get_worker_count()
+    pool = _get_pool(subscribers, workers)
+    # The executor forks its workers on the first submitted call
+    pool.submit(_score_shard, '', '', 0, 0).result()
+
+
+def shutdown_pool():
+    """Stop the matching pool, if any"""
+    global _pool, _snapshot_key
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=True, cancel_futures=True)
+            _pool = None
+            _snapshot_key = None
+
+
+atexit.register(shutdown_pool)
+
+
+def find_best_match_parallel(extracted_address, subscribers, workers=None):
+    """
+    Score all subscribers across a process pool and merge the shard winners
+
+    Args:
+        extracted_address: Address extracted from OCR
+        subscribers: List of subscriber dictionaries
+        workers: Number of worker processes (defaults to get_worker_count())
+
+    Returns:
+        Tuple (best_similarity, best_subscriber) with best_subscriber None
+        when no subscriber could be scored
+    """
+    workers = workers or get_worker_count()
+    pool = _get_pool(subscribers, workers)
+
+    normalized_query = normalize_text(extracted_address)
+    query_postal_code = extract_address_components(normalized_query)['postal_code']
+
+    shard_size = -(-len(_prepared) // workers) or 1
+    best_similarity = 0
+    best_index = None
+    try:
+        futures = [
+            pool.submit(_score_shard, normalized_query, query_postal_code, start, start + shard_size)
+            for start in range(0, len(_prepared), shard_size)
+        ]
+        for future in futures:
+            similarity, index = future.result()
+            # Shards are merged in order, so ties resolve to the earliest subscriber
+            if index is not None and similarity > best_similarity:
+                best_similarity = similarity
+                best_index = index
+    except BrokenProcessPool:
+        # A worker died; drop the pool so the next call starts a new one
+        logger.error("Matching pool broke, scoring this query serially")
+        shutdown_pool()
+        best_similarity, best_index = _score_shard(normalized_query, query_postal_code, 0, len(_prepared))
+
+    if best_index is None:
+        return 0, None
+    return best_similarity, subscribers[best_index]
@@ -1,11 +1,13 @@
 import os
-import gspread
+import time
 import logging
-from oauth2client.service_account import ServiceAccountCredentials
-from config import SHEET_URL, SHEET_ID, WORKSHEET_NAME
+from config import SHEET_URL, SHEET_ID, WORKSHEET_NAME, SUBSCRIBER_CACHE_TTL
 
 logger = logging.getLogger(__name__)
 
+# Last subscriber list fetched, reused for SUBSCRIBER_CACHE_TTL seconds
+_subscriber_cache = {'subscribers': None, 'loaded_at': 0.0}
+
 def get_google_sheets_client():
     """
     Get authenticated Google Sheets client
@@ -14,6 +16,10 @@ def get_google_sheets_client():
         Authenticated gspread client or None if authentication fails
     """
     try:
+        # Imported here so instances that never reach Sheets skip the import cost
+        import gspread
+        from oauth2client.service_account import ServiceAccountCredentials
+        
         # Use service account credentials from environment or file
         scope = ['https://spreadsheets.google.com/feeds', 'https://www.googleapis.com/auth/drive']
         
@@ -42,6 +48,23 @@ def get_google_sheets_client():
         return None
 
 def get_subscriber_data():
+    """
+    Get subscriber data, reusing the last fetch for SUBSCRIBER_CACHE_TTL seconds
+    
+    Returns:
+        List of dictionaries containing subscriber data
+    """
+    now = time.monotonic()
+    if _subscriber_cache['subscribers'] and now - _subscriber_cache['loaded_at'] < SUBSCRIBER_CACHE_TTL:
+        return _subscriber_cache['subscribers']
+    
+    subscribers = fetch_subscriber_data()
+    if subscribers:
+        _subscriber_cache['subscribers'] = subscribers
+        _subscriber_cache['loaded_at'] = now
+    return subscribers
+
+def fetch_subscriber_data():
     """
     Get subscriber data from Google Sheets
     
@@ -5,6 +5,12 @@ document.addEventListener('DOMContentLoaded', function() {
     // DOM elements
     const webcamContainer = document.getElementById('webcam-container');
     const captureBtn = document.getElementById('capture-btn');
+    const autoCaptureBtn = document.getElementById('auto-capture-btn');
+    const autoCaptureHint = document.getElementById('auto-capture-hint');
+    const livePreviewBtn = document.getElementById('live-preview-btn');
+    const livePreviewPanel = document.getElementById('live-preview-panel');
+    const livePreviewStatus = document.getElementById('live-preview-status');
+    const liveConfirmBtn = document.getElementById('live-confirm-btn');
     const restartBtn = document.getElementById('restart-btn');
     const manualEntryBtn = document.getElementById('manual-entry-btn');
     const manualAddressForm = document.getElementById('manual-address-form');
@@ -19,6 +25,34 @@ document.addEventListener('DOMContentLoaded', function() {
     // State variables
     let processingImage = false;
     
+    // Frame quality gate, same thresholds as the server (see config.py)
+    const qualitySettings = {
+        sampleWidth: parseInt(webcamContainer.dataset.sampleWidth, 10) || 320,
+        minSharpness: parseFloat(webcamContainer.dataset.minSharpness) || 60,
+        minBrightness: parseFloat(webcamContainer.dataset.minBrightness) || 40,
+        maxBrightness: parseFloat(webcamContainer.dataset.maxBrightness) || 230
+    };
+    // Captured frames are cropped to the centre and scaled down before upload
+    const captureOptions = { cropFraction: 0.9, targetWidth: 1280, quality: 0.9 };
+    
+    // Auto-capture: check frames periodically and capture once enough
+    // consecutive frames are sharp, well lit and not moving
+    const AUTO_CAPTURE_INTERVAL_MS = 200;
+    const AUTO_CAPTURE_STABLE_FRAMES = 4;
+    const AUTO_CAPTURE_MAX_MOTION = 6; // mean absolute gray difference between frames
+    let autoCaptureTimer = null;
+    let stableFrames = 0;
+    let previousGray = null;
+    
+    // Live preview: low-resolution frames are sent with at most one request
+    // in flight, so frames taken while the server is busy are never sent
+    const LIVE_FRAME_INTERVAL_MS = 300;
+    const liveCaptureOptions = { cropFraction: 0.9, targetWidth: 640, quality: 0.7 };
+    let liveTimer = null;
+    let liveSessionId = null;
+    let liveRequestInFlight = false;
+    let liveMatch = null;
+    
     // Initialize webcam
     function initializeWebcam() {
         Webcam.attach('webcam-container');
@@ -26,6 +60,8 @@ document.addEventListener('DOMContentLoaded', function() {
         // Reset UI
         showElement(webcamContainer);
         showElement(captureBtn);
+        showElement(autoCaptureBtn);
+        showElement(livePreviewBtn);
         hideElement(restartBtn);
         hideElement(loadingIndicator);
         hideElement(resultContainer);
@@ -48,21 +84,211 @@ document.addEventListener('DOMContentLoaded', function() {
     function captureImage() {
         if (processingImage) return;
         
+        // Auto-capture resumes if the server rejects the frame
+        const resumeAutoCapture = autoCaptureTimer !== null;
+        stopAutoCapture();
+        stopLivePreview();
+        hideElement(autoCaptureHint);
         processingImage = true;
         showElement(loadingIndicator);
         hideElement(captureBtn);
+        hideElement(autoCaptureBtn);
+        hideElement(livePreviewBtn);
         
-        Webcam.snap(function(dataUrl) {
-            // Stop webcam after capturing image
-            Webcam.stop();
-            
-            // Process the image with OCR
-            processImage(dataUrl);
-        });
+        // The webcam keeps running until the server accepts the frame
+        Webcam.snapRegion(function(dataUrl) {
+            processImage(dataUrl, resumeAutoCapture);
+        }, captureOptions);
+    }
+    
+    // Go back to capturing after the server rejected a blurry or dark frame
+    function retryCapture(message, resumeAutoCapture) {
+        hideElement(statusMessage);
+        showElement(captureBtn);
+        showElement(autoCaptureBtn);
+        showElement(livePreviewBtn);
+        if (resumeAutoCapture) {
+            startAutoCapture();
+        }
+        autoCaptureHint.innerHTML = message;
+        showElement(autoCaptureHint);
+    }
+    
+    // Mean absolute difference between two gray frames of the same size
+    function frameMotion(previous, current) {
+        if (!previous || previous.length !== current.length) return Infinity;
+        let total = 0;
+        for (let i = 0; i < current.length; i++) {
+            total += Math.abs(current[i] - previous[i]);
+        }
+        return total / current.length;
+    }
+    
+    // Check the current frame and capture it once it has been good for long enough
+    function checkAutoCaptureFrame() {
+        if (processingImage) return;
+        
+        const frame = Webcam.measureQuality(qualitySettings.sampleWidth, captureOptions.cropFraction);
+        if (!frame) return;
+        
+        const motion = frameMotion(previousGray, frame.gray);
+        previousGray = frame.gray;
+        
+        let hint = '';
+        if (frame.brightness < qualitySettings.minBrightness) {
+            hint = 'Demasiado oscuro';
+        } else if (frame.brightness > qualitySettings.maxBrightness) {
+            hint = 'Demasiada luz';
+        } else if (frame.sharpness < qualitySettings.minSharpness) {
+            hint = 'Imagen borrosa, acerca o enfoca el sobre';
+        } else if (motion > AUTO_CAPTURE_MAX_MOTION) {
+            hint = 'Mantén el sobre quieto';
+        }
+        
+        stableFrames = hint ? 0 : stableFrames + 1;
+        autoCaptureHint.innerHTML = hint || 'Imagen estable, capturando...';
+        
+        if (stableFrames >= AUTO_CAPTURE_STABLE_FRAMES) {
+            captureImage();
+        }
+    }
+    
+    function startAutoCapture() {
+        if (autoCaptureTimer) return;
+        stopLivePreview();
+        stableFrames = 0;
+        previousGray = null;
+        autoCaptureBtn.classList.add('active');
+        autoCaptureHint.innerHTML = 'Captura automática: coloca el sobre frente a la cámara';
+        showElement(autoCaptureHint);
+        autoCaptureTimer = setInterval(checkAutoCaptureFrame, AUTO_CAPTURE_INTERVAL_MS);
+    }
+    
+    function stopAutoCapture() {
+        if (!autoCaptureTimer) return;
+        clearInterval(autoCaptureTimer);
+        autoCaptureTimer = null;
+        previousGray = null;
+        autoCaptureBtn.classList.remove('active');
+        hideElement(autoCaptureHint);
+    }
+    
+    function toggleAutoCapture() {
+        if (autoCaptureTimer) {
+            stopAutoCapture();
+        } else {
+            startAutoCapture();
+        }
+    }
+    
+    // Send the current frame to the live pipeline unless a request is pending
+    function sendLiveFrame() {
+        if (liveRequestInFlight || !Webcam.streaming) return;
+        liveRequestInFlight = true;
+        const sessionId = liveSessionId;
+        
+        Webcam.snapRegion(function(dataUrl) {
+            fetch('/live-frame', {
+                method: 'POST',
+                headers: {
+                    'Content-Type': 'application/json'
+                },
+                body: JSON.stringify({ session_id: sessionId, image: dataUrl })
+            })
+            .then(response => response.json())
+            .then(data => {
+                // Ignore answers that arrive after the preview was stopped
+                if (liveSessionId === sessionId) {
+                    showLiveResult(data);
+                }
+            })
+            .catch(error => {
+                console.error('Error:', error);
+            })
+            .finally(() => {
+                liveRequestInFlight = false;
+            });
+        }, liveCaptureOptions);
+    }
+    
+    // Show the tentative result of the live pipeline
+    function showLiveResult(data) {
+        if (data.error) {
+            livePreviewStatus.innerHTML = `Error: ${data.error}`;
+            return;
+        }
+        
+        if (data.status === 'match_found') {
+            liveMatch = data;
+            livePreviewStatus.innerHTML = `
+                <strong>${data.subscriber.name || 'N/A'}</strong><br>
+                ${data.subscriber.address || ''}
+            `;
+            showElement(liveConfirmBtn);
+            return;
+        }
+        
+        liveMatch = null;
+        hideElement(liveConfirmBtn);
+        if (data.status === 'low_quality') {
+            livePreviewStatus.innerHTML = 'Imagen borrosa o mal iluminada';
+        } else if (data.extracted_address) {
+            livePreviewStatus.innerHTML = `Leyendo: <code>${data.extracted_address}</code>`;
+        } else {
+            livePreviewStatus.innerHTML = 'Buscando dirección...';
+        }
+    }
+    
+    function startLivePreview() {
+        if (liveTimer) return;
+        stopAutoCapture();
+        liveSessionId = (window.crypto && crypto.randomUUID) ? crypto.randomUUID() : String(Date.now()) + Math.random();
+        liveMatch = null;
+        livePreviewBtn.classList.add('active');
+        livePreviewStatus.innerHTML = 'Buscando dirección...';
+        hideElement(liveConfirmBtn);
+        showElement(livePreviewPanel);
+        liveTimer = setInterval(sendLiveFrame, LIVE_FRAME_INTERVAL_MS);
+    }
+    
+    function stopLivePreview() {
+        if (!liveTimer) return;
+        clearInterval(liveTimer);
+        liveTimer = null;
+        
+        // Let the server drop the session state
+        fetch('/live-end', {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json'
+            },
+            body: JSON.stringify({ session_id: liveSessionId })
+        }).catch(error => console.error('Error:', error));
+        
+        liveSessionId = null;
+        livePreviewBtn.classList.remove('active');
+        hideElement(livePreviewPanel);
+    }
+    
+    function toggleLivePreview() {
+        if (liveTimer) {
+            stopLivePreview();
+        } else {
+            startLivePreview();
+        }
+    }
+    
+    // Accept the tentative live match and go to the confirmation screen
+    function confirmLiveMatch() {
+        if (!liveMatch) return;
+        const data = liveMatch;
+        stopLivePreview();
+        Webcam.stop();
+        showConfirmationScreen(data);
     }
     
     // Process the captured image
-    function processImage(imageData) {
+    function processImage(imageData, resumeAutoCapture) {
         statusMessage.innerHTML = 'Procesando imagen...';
         showElement(statusMessage);
         
@@ -71,10 +297,15 @@ document.addEventListener('DOMContentLoaded', function() {
             headers: {
                 'Content-Type': 'application/json'
             },
-            body: JSON.stringify({ image: imageData })
+            body: JSON.stringify({ image: imageData, include_preview: true })
         })
         .then(response => response.json())
         .then(data => {
+            if (data.status === 'low_quality') {
+                retryCapture(data.error, resumeAutoCapture);
+                return;
+            }
+            Webcam.stop();
             if (data.status === 'match_found') {
                 showConfirmationScreen(data);
             } else {
@@ -83,6 +314,7 @@ document.addEventListener('DOMContentLoaded', function() {
         })
         .catch(error => {
             console.error('Error:', error);
+            Webcam.stop();
             statusMessage.innerHTML = `Error: ${error.message || 'Ha ocurrido un error al procesar la imagen.'}`;
             showElement(restartBtn);
         })
@@ -97,6 +329,8 @@ document.addEventListener('DOMContentLoaded', function() {
         // Hide webcam container and other elements
         hideElement(webcamContainer);
         hideElement(captureBtn);
+        hideElement(autoCaptureBtn);
+        hideElement(livePreviewBtn);
         hideElement(manualEntryBtn);
         hideElement(manualAddressForm);
         
@@ -108,8 +342,15 @@ document.addEventListener('DOMContentLoaded', function() {
         const confirmationSubscriber = document.getElementById('confirmation-subscriber');
         const emailPreview = document.getElementById('email-preview');
         
+        // Warn if this envelope was already processed
+        const previousNotice = data.already_processed ? `
+            <div class="alert alert-warning">
+                Este sobre ya se procesó el ${new Date(data.processed_at).toLocaleString()}${data.notification_sent ? ' y se envió el email' : ''}.
+            </div>
+        ` : '';
+        
         // Display extracted address with more details
-        confirmationAddress.innerHTML = `
+        confirmationAddress.innerHTML = previousNotice + `
             <div class="mb-3">
                 <h6>Texto completo extraído por OCR:</h6>
                 <div class="border p-2 bg-light text-dark" style="overflow-x: auto;">
@@ -130,8 +371,12 @@ document.addEventListener('DOMContentLoaded', function() {
             <strong>Dirección registrada:</strong> ${subscriber.address || 'N/A'}
         `;
         
-        // Load email preview
-        loadEmailPreview(subscriber);
+        // Use the preview sent with the match, otherwise fetch it
+        if (data.email_html) {
+            emailPreview.innerHTML = data.email_html;
+        } else {
+            loadEmailPreview(subscriber);
+        }
         
         // Setup event listeners for confirmation buttons
         setupConfirmationButtons(data);
@@ -157,7 +402,7 @@ document.addEventListener('DOMContentLoaded', function() {
             headers: {
                 'Content-Type': 'application/json'
             },
-            body: JSON.stringify({ address: addressText })
+            body: JSON.stringify({ address: addressText, include_preview: true })
         })
         .then(response => response.json())
         .then(data => {
@@ -199,6 +444,8 @@ document.addEventListener('DOMContentLoaded', function() {
             statusMessage.innerHTML = 'Se ha encontrado un suscriptor, pero ha fallado el envío del email.';
         } else if (data.status === 'success') {
             statusMessage.innerHTML = '¡Email enviado con éxito!';
+        } else if (data.status === 'duplicate') {
+            statusMessage.innerHTML = 'Este sobre ya se notificó anteriormente; no se ha vuelto a enviar el email.';
         }
         
         // Display extracted address if available
@@ -237,12 +484,16 @@ document.addEventListener('DOMContentLoaded', function() {
     
     // Toggle between webcam and manual entry
     function toggleManualEntry() {
+        stopAutoCapture();
+        stopLivePreview();
         if (Webcam.streaming) {
             Webcam.stop();
         }
         
         hideElement(webcamContainer);
         hideElement(captureBtn);
+        hideElement(autoCaptureBtn);
+        hideElement(livePreviewBtn);
         hideElement(resultContainer);
         showElement(manualAddressForm);
         hideElement(manualEntryBtn);
@@ -373,6 +624,9 @@ document.addEventListener('DOMContentLoaded', function() {
     
     // Event listeners
     captureBtn.addEventListener('click', captureImage);
+    autoCaptureBtn.addEventListener('click', toggleAutoCapture);
+    livePreviewBtn.addEventListener('click', toggleLivePreview);
+    liveConfirmBtn.addEventListener('click', confirmLiveMatch);
     restartBtn.addEventListener('click', restartApp);
     manualEntryBtn.addEventListener('click', toggleManualEntry);
     submitManualBtn.addEventListener('click', processManualAddress);
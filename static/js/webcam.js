@@ -131,6 +131,120 @@
             return true;
         },
         
+        /**
+         * Take a snapshot of the centre of the frame, scaled to a target width
+         *
+         * options.cropFraction: fraction of the frame kept around the centre (default 0.9)
+         * options.targetWidth: maximum width of the uploaded image (default 1280)
+         * options.quality: JPEG quality (default 0.9)
+         */
+        snapRegion: function(callback, options) {
+            if (!this.streaming) {
+                console.error("Webcam is not streaming");
+                return false;
+            }
+            
+            callback = callback || this.onCaptureComplete;
+            if (!callback) {
+                console.error("No capture callback specified");
+                return false;
+            }
+            
+            options = options || {};
+            var cropFraction = options.cropFraction || 0.9;
+            var targetWidth = options.targetWidth || 1280;
+            var quality = options.quality || 0.9;
+            
+            // crop around the centre of the native video frame
+            var videoWidth = this.mediaElement.videoWidth || this.width;
+            var videoHeight = this.mediaElement.videoHeight || this.height;
+            var cropWidth = Math.round(videoWidth * cropFraction);
+            var cropHeight = Math.round(videoHeight * cropFraction);
+            var cropX = Math.round((videoWidth - cropWidth) / 2);
+            var cropY = Math.round((videoHeight - cropHeight) / 2);
+            
+            // never upscale
+            var scale = Math.min(1, targetWidth / cropWidth);
+            
+            var canvas = document.createElement('canvas');
+            canvas.width = Math.round(cropWidth * scale);
+            canvas.height = Math.round(cropHeight * scale);
+            
+            var context = canvas.getContext('2d');
+            context.drawImage(this.mediaElement, cropX, cropY, cropWidth, cropHeight,
+                              0, 0, canvas.width, canvas.height);
+            
+            callback(canvas.toDataURL('image/jpeg', quality));
+            
+            return true;
+        },
+        
+        /**
+         * Measure sharpness and brightness of the current frame
+         *
+         * The centre crop that snapRegion uploads (cropFraction, default 0.9) is
+         * downscaled to sampleWidth pixels and converted to gray, so the score
+         * is taken on the same region the server checks. Sharpness is the
+         * variance of the 4-neighbour Laplacian, brightness the mean gray level;
+         * both match the server-side check in ocr_utils.
+         * Returns null when no frame is available.
+         */
+        measureQuality: function(sampleWidth, cropFraction) {
+            var videoWidth = this.mediaElement && this.mediaElement.videoWidth;
+            var videoHeight = this.mediaElement && this.mediaElement.videoHeight;
+            if (!this.streaming || !videoWidth || !videoHeight) {
+                return null;
+            }
+            
+            cropFraction = cropFraction || 0.9;
+            var cropWidth = Math.round(videoWidth * cropFraction);
+            var cropHeight = Math.round(videoHeight * cropFraction);
+            var cropX = Math.round((videoWidth - cropWidth) / 2);
+            var cropY = Math.round((videoHeight - cropHeight) / 2);
+            
+            var width = Math.min(sampleWidth || 320, cropWidth);
+            var height = Math.max(1, Math.round(cropHeight * width / cropWidth));
+            
+            // reuse the sampling canvas between calls
+            if (!this.sampleCanvas) {
+                this.sampleCanvas = document.createElement('canvas');
+            }
+            var canvas = this.sampleCanvas;
+            canvas.width = width;
+            canvas.height = height;
+            
+            var context = canvas.getContext('2d', { willReadFrequently: true });
+            context.drawImage(this.mediaElement, cropX, cropY, cropWidth, cropHeight, 0, 0, width, height);
+            var pixels = context.getImageData(0, 0, width, height).data;
+            
+            var gray = new Float32Array(width * height);
+            var brightnessSum = 0;
+            for (var i = 0, p = 0; i < gray.length; i++, p += 4) {
+                gray[i] = 0.299 * pixels[p] + 0.587 * pixels[p + 1] + 0.114 * pixels[p + 2];
+                brightnessSum += gray[i];
+            }
+            
+            var sum = 0;
+            var sumSquares = 0;
+            var count = 0;
+            for (var y = 1; y < height - 1; y++) {
+                for (var x = 1; x < width - 1; x++) {
+                    var k = y * width + x;
+                    var laplacian = gray[k - 1] + gray[k + 1] + gray[k - width] + gray[k + width] - 4 * gray[k];
+                    sum += laplacian;
+                    sumSquares += laplacian * laplacian;
+                    count++;
+                }
+            }
+            
+            var mean = count ? sum / count : 0;
+            return {
+                sharpness: count ? sumSquares / count - mean * mean : 0,
+                brightness: brightnessSum / gray.length,
+                gray: gray
+            };
+        },
+        
         /**
          * Stop the webcam stream
          */
@@ -0,0 +1,36 @@
+import pytest
+
+from gazetteer import Gazetteer, correct_ocr_tokens
+
+
+@pytest.mark.parametrize('text, expected', [
+    # Street number suffixes, in either case
+    ('Calle Mayor 31b', 'Calle Mayor 31b'),
+    ('Calle Mayor 31B', 'Calle Mayor 31B'),
+    ('4g', '4g'),
+    ('12bis', '12bis'),
+    # Floor and door tokens are corrected part by part
+    ('2ºB', '2ºB'),
+    ('1ºA', '1ºA'),
+    ('1ºD', '1ºD'),
+    ('3ª', '3ª'),
+    ('2o', '2o'),
+    ('nº5', 'nº5'),
+    # Look-alikes are still corrected in their own slot
+    ('28O13 Madrid', '28013 Madrid'),
+    ('3l', '31'),
+    ('S1LVA', 'SILVA'),
+    ('MAY0R', 'MAYOR'),
+    # A leading digit run is never turned into letters
+    ('3er', '3er'),
+])
+def test_correct_ocr_tokens_keeps_numbers(text, expected):
+    assert correct_ocr_tokens(text) == expected
+
+
+def test_correct_ocr_tokens_snaps_street_words_only_in_street_context():
+    gazetteer = Gazetteer(postal_codes=['28013'], street_words=['mayor', 'madrid'])
+
+    assert correct_ocr_tokens('Calle Mayar 31b, 2ºB', gazetteer) == 'Calle Mayor 31b, 2ºB'
+    assert correct_ocr_tokens('28O14 Madrld', gazetteer) == '28013 Madrid'
+    assert correct_ocr_tokens('Sr. Mario Mayar', gazetteer) == 'Sr. Mario Mayar'